@@ -0,0 +1,133 @@
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import data_analysis
+import sleeper
+from synthetic import generate
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+
+def measure(fn, repeat):
+    """Best wall time over repeat runs, then one run under tracemalloc for peak memory."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"seconds": best, "peak_kb": peak / 1024}
+
+
+def ingest_scores(league_dirs):
+    """sleeper.scores over every synthetic league and year."""
+    for league_dir in league_dirs:
+        for year_dir in sorted(path for path in league_dir.iterdir() if path.is_dir()):
+            association = {
+                int(roster_id): info
+                for roster_id, info in data_analysis.load_json(
+                    year_dir / f"roster_user_association_{year_dir.name}.json"
+                ).items()
+            }
+            sleeper.scores(str(year_dir), sleeper.user_info_init(association), association)
+
+
+def load_history(league_dirs):
+    """load_year over every synthetic league and year, merged like data_analysis's __main__."""
+    final_player = {}
+    for league_dir in league_dirs:
+        for year_dir in sorted(path for path in league_dir.iterdir() if path.is_dir()):
+            for user, info in data_analysis.load_year(str(year_dir)).items():
+                final_player.setdefault(user, {})[int(year_dir.name)] = {
+                    "scores": info["scores"],
+                    "death_week": info["death_week"],
+                }
+    return final_player
+
+
+def run(args):
+    results = {}
+
+    with tempfile.TemporaryDirectory() as root:
+        league_dirs = generate(root, args.leagues, args.years, args.teams, args.weeks)
+        years = range(2019, 2019 + args.years)
+
+        results["ingest.scores"] = measure(lambda: ingest_scores(league_dirs), args.repeat)
+        results["ingest.load_year"] = measure(lambda: load_history(league_dirs), args.repeat)
+
+        final_player = load_history(league_dirs)
+        results["analysis.build_score_matrix"] = measure(
+            lambda: data_analysis.build_score_matrix(final_player, years), args.repeat
+        )
+
+        matrix = data_analysis.build_score_matrix(final_player, years)
+        for name in data_analysis.STATS:
+            results[f"stats.{name}"] = measure(
+                lambda: data_analysis.run_stats(matrix, [name]), args.repeat
+            )
+        results["stats.all"] = measure(
+            lambda: data_analysis.run_stats(matrix), args.repeat
+        )
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Stages slower than the baseline by more than tolerance (a fraction)."""
+    regressions = []
+    for stage, result in results.items():
+        if stage not in baseline:
+            continue
+        before = baseline[stage]["seconds"]
+        if result["seconds"] > before * (1 + tolerance):
+            regressions.append((stage, before, result["seconds"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingest and stats on synthetic leagues.")
+    parser.add_argument("--leagues", type=int, default=1)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--teams", type=int, default=12)
+    parser.add_argument("--weeks", type=int, default=17)
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="store these results as the baseline"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="allowed slowdown before failing"
+    )
+    args = parser.parse_args()
+
+    results = run(args)
+
+    for stage, result in results.items():
+        print(f"{stage:40} {result['seconds'] * 1000:10.2f} ms {result['peak_kb']:12.1f} KiB")
+
+    # Baselines are only comparable for the same data size
+    size = f"{args.leagues}x{args.years}x{args.teams}x{args.weeks}"
+    baseline_path = Path(args.baseline)
+    baselines = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+
+    if args.save_baseline:
+        baselines[size] = results
+        baseline_path.write_text(json.dumps(baselines, indent=4))
+        print(f"Saved baseline for {size} to {baseline_path}")
+    elif size in baselines:
+        regressions = compare(results, baselines[size], args.tolerance)
+        for stage, before, after in regressions:
+            print(f"REGRESSION {stage}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,100 @@
+import argparse
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils import save_to_json
+
+
+def _matchup(roster_id, points, rng):
+    # Mimic the size of a real Sleeper payload, not just the fields we read
+    players = [str(rng.randint(1000, 9999)) for _ in range(15)]
+    return {
+        "roster_id": roster_id,
+        "matchup_id": None,
+        "points": points,
+        "custom_points": None,
+        "starters": players[:9],
+        "starters_points": [round(rng.uniform(0, 30), 2) for _ in range(9)],
+        "players": players,
+        "players_points": {player: round(rng.uniform(0, 30), 2) for player in players},
+    }
+
+
+def generate_season(year_dir, teams, weeks, rng, user_prefix="user"):
+    """
+    Write one guillotine season: week_N.json in Sleeper format, the roster
+    association and the matching sleeper_user_info.json.
+    """
+    year_dir = Path(year_dir)
+    year_dir.mkdir(parents=True, exist_ok=True)
+
+    association = {
+        roster_id: {"username": f"{user_prefix}{roster_id}"}
+        for roster_id in range(1, teams + 1)
+    }
+    user_info = {
+        info["username"]: {"scores": [], "death_week": None}
+        for info in association.values()
+    }
+
+    alive = set(association)
+    for week in range(1, weeks + 1):
+        points = {
+            roster_id: round(rng.uniform(60, 160), 2) if roster_id in alive else 0.0
+            for roster_id in association
+        }
+
+        # The lowest live team is eliminated, the last one standing is champion
+        if len(alive) > 1:
+            eliminated = min(alive, key=lambda roster_id: points[roster_id])
+            alive.remove(eliminated)
+            user_info[association[eliminated]["username"]]["death_week"] = week
+
+        save_to_json(
+            [_matchup(roster_id, points[roster_id], rng) for roster_id in association],
+            year_dir / f"week_{week}.json",
+            compact=True,
+        )
+        for roster_id, info in association.items():
+            user_info[info["username"]]["scores"].append(points[roster_id])
+
+    save_to_json(association, year_dir / f"roster_user_association_{year_dir.name}.json")
+    save_to_json(user_info, year_dir / "sleeper_user_info.json")
+
+    return association
+
+
+def generate(root, leagues=1, years=5, teams=12, weeks=17, first_year=2019, seed=0):
+    """
+    Write synthetic guillotine history under root/league_<n>/<year>/.
+
+    :return: List of league directories
+    """
+    rng = random.Random(seed)
+    league_dirs = []
+
+    for league in range(leagues):
+        league_dir = Path(root) / f"league_{league}"
+        for year in range(first_year, first_year + years):
+            generate_season(
+                league_dir / str(year), teams, weeks, rng, f"league{league}_user"
+            )
+        league_dirs.append(league_dir)
+
+    return league_dirs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic guillotine leagues.")
+    parser.add_argument("root")
+    parser.add_argument("--leagues", type=int, default=1)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--teams", type=int, default=12)
+    parser.add_argument("--weeks", type=int, default=17)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate(args.root, args.leagues, args.years, args.teams, args.weeks, seed=args.seed)
@@ -0,0 +1,34 @@
+import argparse
+import importlib
+
+# {subcommand: (module, help)}, each module is only imported when its subcommand runs
+COMMANDS = {
+    "fetch-sleeper": ("sleeper", "refresh Sleeper seasons from the API"),
+    "fetch-espn": ("espn", "refresh ESPN seasons from the API"),
+    "analyze": ("data_analysis", "print league stats for the saved seasons"),
+    "report": ("week_index", "who went out each week of a season"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="guillotine-stats",
+        description="Fetch and analyze guillotine league seasons.",
+        epilog="Run 'guillotine-stats <command> -h' for a command's own options.",
+    )
+    parser.add_argument(
+        "command",
+        choices=COMMANDS,
+        metavar="command",
+        help=", ".join(f"{name} ({help})" for name, (_, help) in COMMANDS.items()),
+    )
+    parser.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    module_name, _ = COMMANDS[args.command]
+    importlib.import_module(module_name).main(args.args)
+
+
+if __name__ == "__main__":
+    # e.g. python cli.py report 2021 7
+    main()
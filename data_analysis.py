@@ -1,372 +1,853 @@
+import argparse
+import heapq
+import itertools
 from pathlib import Path
-from utils import load_json, save_to_json
 
+import numpy as np
 
+import identity
+import instrument
+import season_store
+import stat_cache
+import week_index
+from models import LeagueHistory, SeasonRecord
+from utils import json_path, load_json, parse_years, save_to_json
+
+
+@instrument.timed("analysis.load_year")
 def load_year(year):
+    """A year directory's user info, or {} when it holds no season file."""
     year_path = Path(year)
-    file_name = ["espn_user_info.json", "sleeper_user_info.json"]
+    data = {}
 
     if year_path.is_dir():  # Check if it's a directory
-        # Look for the JSON files in the directory
-        for json_file in year_path.iterdir():
-            # print(json_file.name)
-            if json_file.name in file_name:
-                try:
-                    # Load the JSON data
+        for file_name in season_store.SEASON_FILES:
+            stem = Path(file_name).stem
+            # Archived seasons are stored as e.g. espn_user_info.json.gz
+            json_file = json_path(year_path / file_name)
+            try:
+                # Memory-map the binary store when it is up to date, even if the
+                # JSON source is gone, else parse the JSON
+                if season_store.is_current(year_path, stem):
+                    data = season_store.load_season(year_path, stem)
+                elif json_file.exists():
                     data = load_json(json_file)
-                except Exception as e:
-                    print(
-                        f"Failed to load {json_file.name} for year {year_path.name}: {e}"
-                    )
+            except Exception as e:
+                print(f"Failed to load {json_file.name} for year {year_path.name}: {e}")
 
     return data
 
 
-def calculate_avg_death_week(data):
-    """Calculate the average death week for each user, replacing None with the max death week from their scores."""
-    for user, user_data in data.items():
-        total_weeks = 0
-        week_count = 0
+class LazyHistory:
+    """
+    The seasons saved on disk, each year loaded the first time it is asked for.
+
+    :param root: Directory holding the year directories
+    :param league: Name reported with each year, defaults to the root directory's name
+    :param years: Years to use, defaults to every year found under root
+    :param names: Map of alternate names to canonical ones, e.g. ESPN to Sleeper
+    """
+
+    def __init__(self, root=".", league=None, years=None, names=None):
+        self.root = Path(root)
+        self.league = league if league is not None else self.root.resolve().name
+        available = season_store.discover_years(self.root)
+        self.years = available if years is None else [y for y in years if y in available]
+        self.names = names or {}
+        self._records = {}
+
+    def records(self, year):
+        """The year's SeasonRecords, loaded on first use."""
+        if year not in self._records:
+            data = load_year(str(self.root / str(year)))
+            self._records[year] = [
+                SeasonRecord.from_dict(self.names.get(user, user), year, info)
+                for user, info in data.items()
+            ]
+        return self._records[year]
+
+    def release(self, year):
+        """Drop a loaded year; it is read again if asked for later."""
+        self._records.pop(year, None)
+
+    def __iter__(self):
+        """(year, league, records) for every year, each loaded as the iteration reaches it."""
+        for year in self.years:
+            yield year, self.league, self.records(year)
+
+    def matrix(self, year):
+        """A one-year ScoreMatrix."""
+        return build_score_matrix(LeagueHistory(self.records(year)), [year])
+
+    def user(self, user):
+        """{year: SeasonRecord} for one user, releasing every year it had to load."""
+        seasons = {}
+        for year in self.years:
+            loaded = year in self._records
+            for record in self.records(year):
+                if record.user == user:
+                    seasons[year] = record
+            if not loaded:
+                self.release(year)
+        return seasons
+
+    def history(self, years=None):
+        """A LeagueHistory of the given years, all of them by default."""
+        years = self.years if years is None else years
+        return LeagueHistory(record for year in years for record in self.records(year))
+
+
+class ScoreMatrix:
+    """Every user's weekly scores for every year, stored as one (year, user, week) array."""
+
+    def __init__(self, years, users, scores, death_weeks, season_lengths, present):
+        self.years = list(years)
+        self.users = list(users)
+        self.year_index = {year: i for i, year in enumerate(self.years)}
+        self.user_index = {user: i for i, user in enumerate(self.users)}
+
+        # (year, user, week) scores, 0 where the user was dead or not in the league
+        self.scores = scores
+        # (year, user) death week, nan for the champion or users missing that year
+        self.death_weeks = death_weeks
+        # (year, user) number of weeks recorded
+        self.season_lengths = season_lengths
+        # (year, user) True if the user played in the league that year
+        self.present = present
+
+        # Only scores greater than 0 count, same as the old per-week lists
+        self.live = scores > 0
+
+
+@instrument.timed("analysis.build_score_matrix")
+def build_score_matrix(history, years):
+    """
+    Build a ScoreMatrix in one pass over a LeagueHistory.
+
+    The nested final_player[user][year] dict is accepted too and converted first.
+    """
+    if not isinstance(history, LeagueHistory):
+        history = LeagueHistory.from_final_player(history)
+
+    # Sorted users so ties resolve by name, the same way sorting (score, user) did
+    users = sorted(history.by_user)
+    years = list(years)
+
+    weeks = 0
+    for year in years:
+        for record in history.by_year.get(year, {}).values():
+            weeks = max(weeks, len(record.scores))
+
+    scores = np.zeros((len(years), len(users), weeks))
+    death_weeks = np.full((len(years), len(users)), np.nan)
+    season_lengths = np.zeros((len(years), len(users)), dtype=int)
+    present = np.zeros((len(years), len(users)), dtype=bool)
+
+    user_index = {user: u for u, user in enumerate(users)}
+    for y, year in enumerate(years):
+        for user, record in history.by_year.get(year, {}).items():
+            u = user_index[user]
+            scores[y, u, : len(record.scores)] = record.scores
+            season_lengths[y, u] = len(record.scores)
+            present[y, u] = True
+
+            if record.death_week is not None:
+                death_weeks[y, u] = record.death_week
+
+    return ScoreMatrix(years, users, scores, death_weeks, season_lengths, present)
+
+
+def weekly_extremes(matrix):
+    """Lowest, second lowest and highest live score (and who had it) for each (year, week)."""
+    return _weekly_extremes(matrix.scores, matrix.live)
+
+
+def _weekly_extremes(scores, live):
+    user_count = scores.shape[1]
+
+    low_masked = np.where(live, scores, np.inf)
+    lowest_user = low_masked.argmin(axis=1)
+
+    # Knock out the lowest score and take the minimum again for the second lowest
+    np.put_along_axis(low_masked, lowest_user[:, np.newaxis, :], np.inf, axis=1)
+    second_user = low_masked.argmin(axis=1)
+
+    # Search the user axis backwards so ties go to the last name, like sorted(...)[-1]
+    high_masked = np.where(live, scores, -np.inf)
+    highest_user = user_count - 1 - high_masked[:, ::-1, :].argmax(axis=1)
+
+    def pick(users):
+        return np.take_along_axis(scores, users[:, np.newaxis, :], axis=1)[:, 0, :]
+
+    return {
+        "live_count": live.sum(axis=1),
+        "lowest_user": lowest_user,
+        "lowest": pick(lowest_user),
+        "second_user": second_user,
+        "second_lowest": pick(second_user),
+        "highest_user": highest_user,
+        "highest": pick(highest_user),
+    }
 
-        for year, year_data in user_data.items():
-            scores = year_data["scores"]
-            death_week = year_data["death_week"]
 
-            # Determine the max death week from the length of the scores
-            max_death_week = len(scores)
+def weekly_from_index(matrix, index, aliases=None):
+    """
+    One year's weekly extremes read from its saved weekly_index.json instead of the scores.
 
-            # Replace None (if death_week is missing) with the max possible death week for that year
-            if death_week is None:
-                death_week = max_death_week
+    :param index: Entries from week_index.load_week_index
+    :param aliases: Map of names in the index to names in the matrix, e.g. ESPN to Sleeper
+    """
+    aliases = aliases or {}
+    weeks = matrix.scores.shape[2]
 
-            total_weeks += death_week
-            week_count += 1
+    weekly = {"live_count": np.zeros(weeks, dtype=int)}
+    for score_key, user_key in WEEKLY_KEYS:
+        weekly[user_key] = np.zeros(weeks, dtype=int)
+        weekly[score_key] = np.zeros(weeks)
 
-        # Calculate the average death week for the user
-        average_death_week = total_weeks / week_count if week_count > 0 else 0
-        data[user]["average_death_week"] = average_death_week
+    for entry in index[:weeks]:
+        w = entry["week"] - 1
+        weekly["live_count"][w] = entry["live"]
 
-    return data
+        for score_key, user_key in WEEKLY_KEYS:
+            if entry[score_key] is not None:
+                user, score = entry[score_key]
+                weekly[user_key][w] = matrix.user_index[aliases.get(user, user)]
+                weekly[score_key][w] = score
 
+    return weekly
 
-def print_sorted_by_best_death_week(data):
-    # Extract the usernames and their average death weeks
-    users_with_avg_death_week = [
-        (user, user_data["average_death_week"]) for user, user_data in data.items()
-    ]
 
-    # Sort by the average death week (lower is better)
-    sorted_users = sorted(users_with_avg_death_week, key=lambda x: x[1], reverse=True)
+# weekly_index.json entry key -> weekly extremes key holding the user
+WEEKLY_KEYS = [
+    ("lowest", "lowest_user"),
+    ("second_lowest", "second_user"),
+    ("highest", "highest_user"),
+]
 
-    # Print the sorted usernames and their average death week
-    for user, avg_death_week in sorted_users:
-        print(f"{user}: Average Death Week = {avg_death_week:.2f}")
 
-def highest_in_year(data):
-    highest_scores_per_year = {}
-
-    for year in range(2019, 2024):
-        max_score = 0
-        top_scorer = None
-        top_week = None
-
-        for user, data in final_player.items():
-            if year in data:
-                scores = data[year]["scores"]
-                if scores:
-                    # Find the highest score and its corresponding week index
-                    user_max_score = max(scores)
-                    user_max_week = scores.index(user_max_score) + 1  # +1 to make it 1-indexed
-
-                    # Update if this user has the highest score for the year
-                    if user_max_score > max_score:
-                        max_score = user_max_score
-                        top_scorer = user
-                        top_week = user_max_week
-
-        highest_scores_per_year[year] = {
-            "player": top_scorer,
-            "score": max_score,
-            "week": top_week
-        }
+class Season:
+    """One year's slice of the score matrix and its weekly extremes, handed to every stat."""
+
+    def __init__(self, matrix, y, weekly=None):
+        self.year = matrix.years[y]
+        self.users = matrix.users
+        self.scores = matrix.scores[y]  # (user, week)
+        self.live = matrix.live[y]
+        self.present = matrix.present[y]
+        self.death_weeks = matrix.death_weeks[y]
+        self.season_lengths = matrix.season_lengths[y]
+        self._weekly = None if weekly is None else {k: v[y] for k, v in weekly.items()}
+
+    @property
+    def weekly(self):
+        """Weekly extremes for this year, (week,) arrays computed on first use."""
+        if self._weekly is None:
+            weekly = _weekly_extremes(self.scores[np.newaxis], self.live[np.newaxis])
+            self._weekly = {name: values[0] for name, values in weekly.items()}
+        return self._weekly
+
+    def player_score(self, user_key, score_key, week):
+        """(user, score) for one of the weekly extremes, e.g. ("lowest_user", "lowest")."""
+        return (
+            self.users[self.weekly[user_key][week]],
+            float(self.weekly[score_key][week]),
+        )
+
 
-    return highest_scores_per_year
-
-def lowest_in_year(data):
-    lowest_scores_per_year = {}
-
-    for year in range(2019, 2024):
-        min_score = float('inf')
-        bottom_scorer = None
-        bottom_week = None
-
-        for user, data in final_player.items():
-            if year in data:
-                scores = data[year]["scores"]
-                if scores:
-                    # Filter out scores of 0 and find the lowest score
-                    valid_scores = [score for score in scores if score > 0]
-
-                    if valid_scores:  # Only proceed if there are valid scores
-                        user_min_score = min(valid_scores)
-                        user_min_week = scores.index(user_min_score) + 1  # +1 to make it 1-indexed
-
-                        # Update if this user has the lowest score for the year
-                        if user_min_score < min_score:
-                            min_score = user_min_score
-                            bottom_scorer = user
-                            bottom_week = user_min_week
-
-        lowest_scores_per_year[year] = {
-            "player": bottom_scorer,
-            "score": min_score,
-            "week": bottom_week
+# Stat name -> reducer class, filled in by register_stat
+STATS = {}
+
+
+def register_stat(name):
+    """Class decorator adding a reducer to the stats computed by run_stats."""
+
+    def register(reducer):
+        reducer.name = name
+        STATS[name] = reducer
+        return reducer
+
+    return register
+
+
+class StatReducer:
+    """
+    A statistic that is fed one Season at a time and reports a result at the end.
+
+    year_result and load_year_result let run_stats store a year's contribution in
+    the stat cache and feed it back instead of the Season when the year is unchanged.
+    """
+
+    name = None
+    options = ()
+
+    def add_season(self, season):
+        raise NotImplementedError
+
+    def year_result(self, year):
+        raise NotImplementedError
+
+    def load_year_result(self, year, value):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+
+class PerYearStat(StatReducer):
+    """A stat whose result is {year: value}, with season_result giving each year's value."""
+
+    def __init__(self):
+        self.per_year = {}
+
+    def season_result(self, season):
+        raise NotImplementedError
+
+    def add_season(self, season):
+        self.load_year_result(season.year, self.season_result(season))
+
+    def year_result(self, year):
+        return self.per_year.get(year)
+
+    def load_year_result(self, year, value):
+        # None means the year had nothing to report
+        if value is not None:
+            self.per_year[year] = value
+
+    def result(self):
+        return self.per_year
+
+
+def run_stats(
+    matrix,
+    names=None,
+    weekly=None,
+    cache=None,
+    year_digests=None,
+    week_indexes=None,
+    aliases=None,
+    **options,
+):
+    """
+    Compute stats in a single pass over the years of the score matrix.
+
+    :param matrix: ScoreMatrix from build_score_matrix
+    :param names: Registered stat names to run, defaults to all of them
+    :param weekly: Precomputed weekly_extremes(matrix), otherwise built per year as needed
+    :param cache: Optional stat_cache.StatCache holding earlier per-year results
+    :param year_digests: {year: stat_cache.year_digest(...)}, required with cache
+    :param week_indexes: {year: saved week index}, used instead of rescanning those years
+    :param aliases: Map of names in the week indexes to names in the matrix
+    :param options: Keyword arguments for the reducers that accept them, e.g. k
+    :return: Dict of {stat name: result}
+    """
+    def seasons():
+        for y, year in enumerate(matrix.years):
+            yield year, lambda y=y: _season(matrix, y, weekly, week_indexes, aliases)
+
+    return _run_reducers(seasons(), names, cache, year_digests, options)
+
+
+def run_stats_lazy(
+    history,
+    names=None,
+    cache=None,
+    year_digests=None,
+    week_indexes=None,
+    aliases=None,
+    **options,
+):
+    """
+    run_stats over a LazyHistory, one single-year score matrix at a time.
+
+    A year is only loaded when some stat is not cached for it, and released as
+    soon as every stat has seen it, so at most one season is held in memory.
+    """
+
+    def seasons():
+        for year in history.years:
+            yield year, lambda year=year: _season(
+                history.matrix(year), 0, None, week_indexes, aliases
+            )
+
+    return _run_reducers(
+        seasons(), names, cache, year_digests, options, release=history.release
+    )
+
+
+def _season(matrix, y, weekly, week_indexes, aliases):
+    season = Season(matrix, y, weekly)
+    index = (week_indexes or {}).get(season.year)
+    if weekly is None and index is not None:
+        season._weekly = weekly_from_index(matrix, index, aliases)
+    return season
+
+
+def _run_reducers(seasons, names, cache, year_digests, options, release=None):
+    names = list(STATS) if names is None else names
+
+    reducers = []
+    for name in names:
+        reducer = STATS[name]
+        reducer_options = {k: v for k, v in options.items() if k in reducer.options}
+        reducers.append((reducer(**reducer_options), reducer_options))
+
+    # Every year is sliced once, on the first stat not already cached for it
+    for year, load_season in seasons:
+        season = None
+        for reducer, reducer_options in reducers:
+            if cache is not None:
+                hit, value = cache.get(
+                    reducer.name, year, year_digests[year], reducer_options
+                )
+                if hit:
+                    instrument.count("stat_cache.hits")
+                    reducer.load_year_result(year, value)
+                    continue
+
+            if season is None:
+                season = load_season()
+
+            with instrument.stage(f"stats.{reducer.name}"):
+                reducer.add_season(season)
+
+            if cache is not None:
+                cache.put(
+                    reducer.name,
+                    year,
+                    year_digests[year],
+                    reducer.year_result(year),
+                    reducer_options,
+                )
+
+        if release is not None:
+            release(year)
+
+    return {reducer.name: reducer.result() for reducer, _ in reducers}
+
+
+def _two_live(season):
+    # Only weeks with at least two valid scores count
+    return season.weekly["live_count"] >= 2
+
+
+@register_stat("average_death_week")
+class AverageDeathWeek(StatReducer):
+    def __init__(self):
+        self.death_weeks_per_year = {}
+
+    def add_season(self, season):
+        # Replace None (if death_week is missing) with the max possible death week for that year
+        death_weeks = np.where(
+            np.isnan(season.death_weeks), season.season_lengths, season.death_weeks
+        )
+
+        self.death_weeks_per_year[season.year] = {
+            season.users[u]: float(death_weeks[u]) for u in np.flatnonzero(season.present)
         }
 
-    return lowest_scores_per_year
-
-def narrowest_loss(data):
-    narrowest_losses_per_year = {}
-
-    for year in range(2019, 2024):
-        closest_diff = float('inf')  # Start with a large value
-        lowest_score_user = None
-        second_lowest_score_user = None
-        narrowest_week = None
-        narrowest_players = (None, None)
-
-        # Initialize a dictionary to hold weekly scores for each week
-        weekly_scores = {week: [] for week in range(1, 19)}  # Assuming 18 weeks max
-
-        # Collect scores for each week from all users
-        for user, user_data in data.items():
-            if year in user_data:
-                scores = user_data[year]["scores"]
-                
-                # Append each user's score to the corresponding week
-                for week, score in enumerate(scores, start=1):
-                    if score > 0:  # Only consider scores greater than 0
-                        weekly_scores[week].append((score, user))
-
-        # For each week, find the narrowest difference between the lowest two scores
-        for week, scores in weekly_scores.items():
-            if len(scores) >= 2:  # Only consider weeks with at least two valid scores
-                # Sort scores to find the lowest two
-                sorted_scores = sorted(scores)  # Sort by score, ascending
-                lowest_score, lowest_user = sorted_scores[0]
-                second_lowest_score, second_user = sorted_scores[1]
-
-                # Calculate the difference
-                diff = second_lowest_score - lowest_score
-
-                # Update if this is the narrowest difference found so far
-                if diff < closest_diff:
-                    closest_diff = diff
-                    narrowest_week = week
-                    narrowest_players = (lowest_user, second_user)
-                    lowest_score_user = (lowest_user, lowest_score)
-                    second_lowest_score_user = (second_user, second_lowest_score)
+    def year_result(self, year):
+        return self.death_weeks_per_year[year]
+
+    def load_year_result(self, year, value):
+        self.death_weeks_per_year[year] = value
+
+    def result(self):
+        total_weeks = {}
+        week_count = {}
+        for death_weeks in self.death_weeks_per_year.values():
+            for user, death_week in death_weeks.items():
+                total_weeks[user] = total_weeks.get(user, 0) + death_week
+                week_count[user] = week_count.get(user, 0) + 1
+
+        # Calculate the average death week for each user
+        return {user: total_weeks[user] / week_count[user] for user in sorted(total_weeks)}
+
+
+@register_stat("highest_in_year")
+class HighestInYear(PerYearStat):
+    def season_result(self, season):
+        scores = season.scores
+
+        # Highest score of the year across every user and week at once
+        best = int(scores.argmax()) if scores.size else 0
+        if scores.size and scores.flat[best] > 0:
+            user, week = divmod(best, scores.shape[1])
+            return {
+                "player": season.users[user],
+                "score": float(scores[user, week]),
+                "week": week + 1,  # +1 to make it 1-indexed
+            }
 
-        # Store the narrowest loss for the year
-        if narrowest_week is not None:
-            narrowest_losses_per_year[year] = {
-                "week": narrowest_week,
-                "lowest": lowest_score_user,
-                "second lowest":  second_lowest_score_user,
-                "difference": closest_diff
+        return {"player": None, "score": 0, "week": None}
+
+
+@register_stat("lowest_in_year")
+class LowestInYear(PerYearStat):
+    def season_result(self, season):
+        # Filter out scores of 0 and find the lowest score
+        scores = np.where(season.live, season.scores, np.inf)
+
+        worst = int(scores.argmin()) if scores.size else 0
+        if scores.size and np.isfinite(scores.flat[worst]):
+            user, week = divmod(worst, scores.shape[1])
+            return {
+                "player": season.users[user],
+                "score": float(scores[user, week]),
+                "week": week + 1,  # +1 to make it 1-indexed
             }
-    # print(weekly_scores)
-    return narrowest_losses_per_year
 
-# Largest difference between lowest and second lowest
-def bye_week(data):
-    largest_diff_per_year = {}
-
-    for year in range(2019, 2024):
-        largest_diff = 0  # Start with a large value
-        lowest_score_user = None
-        second_lowest_score_user = None
-        wide_week = None
-        closest_players = (None, None)
-
-        # Initialize a dictionary to hold weekly scores for each week
-        weekly_scores = {week: [] for week in range(1, 19)}  # Assuming 18 weeks max
-
-        # Collect scores for each week from all users
-        for user, user_data in data.items():
-            if year in user_data:
-                scores = user_data[year]["scores"]
-                
-                # Append each user's score to the corresponding week
-                for week, score in enumerate(scores, start=1):
-                    if score > 0:  # Only consider scores greater than 0
-                        weekly_scores[week].append((score, user))
-
-        # For each week, find the difference between the lowest two scores
-        for week, scores in weekly_scores.items():
-            if len(scores) >= 2:  # Only consider weeks with at least two valid scores
-                # Sort scores to find the lowest two
-                sorted_scores = sorted(scores)  # Sort by score, ascending
-                lowest_score, lowest_user = sorted_scores[0]
-                second_lowest_score, second_user = sorted_scores[1]
-
-                # Calculate the difference
-                diff = second_lowest_score - lowest_score
-
-                # Update if this is the narrowest difference found so far
-                if diff > largest_diff:
-                    largest_diff = diff
-                    wide_week = week
-                    closest_players = (lowest_user, second_user)
-                    lowest_score_user = (lowest_user, lowest_score)
-                    second_lowest_score_user = (second_user, second_lowest_score)
+        return {"player": None, "score": float("inf"), "week": None}
+
+
+@register_stat("narrowest_loss")
+class NarrowestLoss(PerYearStat):
+    def season_result(self, season):
+        weekly = season.weekly
+        diffs = np.where(
+            _two_live(season), weekly["second_lowest"] - weekly["lowest"], np.inf
+        )
+        if diffs.size == 0:
+            return None
+
+        week = int(diffs.argmin())
+        if not np.isfinite(diffs[week]):
+            return None
 
         # Store the narrowest loss for the year
-        if wide_week is not None:
-            largest_diff_per_year[year] = {
-                "week": wide_week,
-                "lowest": lowest_score_user,
-                "second lowest":  second_lowest_score_user,
-                "difference": largest_diff
-            }
-    # print(weekly_scores)
-    return largest_diff_per_year
+        return {
+            "week": week + 1,
+            "lowest": season.player_score("lowest_user", "lowest", week),
+            "second lowest": season.player_score("second_user", "second_lowest", week),
+            "difference": float(diffs[week]),
+        }
+
+
+# Largest difference between lowest and second lowest
+@register_stat("bye_week")
+class ByeWeek(PerYearStat):
+    def season_result(self, season):
+        weekly = season.weekly
+        diffs = np.where(_two_live(season), weekly["second_lowest"] - weekly["lowest"], 0)
+        if diffs.size == 0:
+            return None
+
+        week = int(diffs.argmax())
+        if diffs[week] <= 0:
+            return None
+
+        return {
+            "week": week + 1,
+            "lowest": season.player_score("lowest_user", "lowest", week),
+            "second lowest": season.player_score("second_user", "second_lowest", week),
+            "difference": float(diffs[week]),
+        }
+
 
 # Largest difference between lowest and highest score
-def david_goliath(data):
-    largest_diff_per_year = {}
-
-    for year in range(2019, 2024):
-        largest_diff = 0  # Start with a large value
-        lowest_score_user = None
-        highest_score_user = None
-        wide_week = None
-        closest_players = (None, None)
-
-        # Initialize a dictionary to hold weekly scores for each week
-        weekly_scores = {week: [] for week in range(1, 19)}  # Assuming 18 weeks max
-
-        # Collect scores for each week from all users
-        for user, user_data in data.items():
-            if year in user_data:
-                scores = user_data[year]["scores"]
-                
-                # Append each user's score to the corresponding week
-                for week, score in enumerate(scores, start=1):
-                    if score > 0:  # Only consider scores greater than 0
-                        weekly_scores[week].append((score, user))
-
-        # For each week, find the difference between the lowest two scores
-        for week, scores in weekly_scores.items():
-            if len(scores) >= 2:  # Only consider weeks with at least two valid scores
-                # Sort scores to find the lowest two
-                sorted_scores = sorted(scores)  # Sort by score, ascending
-                lowest_score, lowest_user = sorted_scores[0]
-                highest_score, highest_user = sorted_scores[-1]
-
-                # Calculate the difference
-                diff = highest_score - lowest_score
-
-                # Update if this is the narrowest difference found so far
-                if diff > largest_diff:
-                    largest_diff = diff
-                    wide_week = week
-                    closest_players = (lowest_user, highest_user)
-                    lowest_score_user = (lowest_user, lowest_score)
-                    highest_score_user = (highest_user, highest_score)
+@register_stat("david_goliath")
+class DavidGoliath(PerYearStat):
+    def season_result(self, season):
+        weekly = season.weekly
+        diffs = np.where(_two_live(season), weekly["highest"] - weekly["lowest"], 0)
+        if diffs.size == 0:
+            return None
+
+        week = int(diffs.argmax())
+        if diffs[week] <= 0:
+            return None
+
+        return {
+            "week": week + 1,
+            "lowest": season.player_score("lowest_user", "lowest", week),
+            "second lowest": season.player_score("highest_user", "highest", week),
+            "difference": float(diffs[week]),
+        }
 
-        # Store the narrowest loss for the year
-        if wide_week is not None:
-            largest_diff_per_year[year] = {
-                "week": wide_week,
-                "lowest": lowest_score_user,
-                "second lowest":  highest_score_user,
-                "difference": largest_diff
-            }
-    # print(weekly_scores)
-    return largest_diff_per_year
 
-def top_5_narrowest_losses(data):
-    narrowest_losses_per_year = {}
+def _narrowest_weeks(season, k):
+    """The k weeks with the smallest gap between the lowest two scores, smallest first."""
+    weekly = season.weekly
+    diffs = weekly["second_lowest"] - weekly["lowest"]
+
+    # Bounded max-heap of the k smallest differences; on ties the earlier week wins
+    heap = []
+    for week in np.flatnonzero(_two_live(season)):
+        item = (-float(diffs[week]), -int(week))
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    return [
+        {
+            "week": week + 1,
+            "players": (
+                season.users[weekly["lowest_user"][week]],
+                season.users[weekly["second_user"][week]],
+            ),
+            "difference": -neg_diff,
+        }
+        for neg_diff, week in ((d, -w) for d, w in sorted(heap, reverse=True))
+    ]
 
-    for year in range(2019, 2024):
-        weekly_diffs = []  # To store differences for each week
 
-        # Initialize a dictionary to hold weekly scores for each week
-        weekly_scores = {week: [] for week in range(1, 19)}  # Assuming 18 weeks max
+@register_stat("top_narrowest_losses")
+class TopNarrowestLosses(PerYearStat):
+    options = ("k",)
 
-        # Collect scores for each week from all users
-        for user, user_data in final_player.items():
-            if year in user_data:
-                scores = user_data[year]["scores"]
+    def __init__(self, k=5):
+        super().__init__()
+        self.k = k
 
-                # Append each user's score to the corresponding week
-                for week, score in enumerate(scores, start=1):
-                    if score > 0:  # Only consider scores greater than 0
-                        weekly_scores[week].append((score, user))
+    def season_result(self, season):
+        return _narrowest_weeks(season, self.k)
 
-        # For each week, find the narrowest difference between the lowest two scores
-        for week, scores in weekly_scores.items():
-            if len(scores) >= 2:  # Only consider weeks with at least two valid scores
-                # Sort scores to find the lowest two
-                sorted_scores = sorted(scores)  # Sort by score, ascending
-                lowest_score, lowest_user = sorted_scores[0]
-                second_lowest_score, second_user = sorted_scores[1]
 
-                # Calculate the difference
-                diff = second_lowest_score - lowest_score
+# Narrowest losses across every year, e.g. the top 50 eliminations ever
+@register_stat("all_time_narrowest_losses")
+class AllTimeNarrowestLosses(StatReducer):
+    options = ("all_time_k",)
 
-                # Append the result for this week
-                weekly_diffs.append({
-                    "week": week,
-                    "players": (lowest_user, second_user),
-                    "difference": diff
-                })
+    def __init__(self, all_time_k=10):
+        self.k = all_time_k
+        self.per_year = {}
 
-        # Sort all weekly differences by the smallest difference and select the top 5
-        top_5_diffs = sorted(weekly_diffs, key=lambda x: x["difference"])[:5]
+    def add_season(self, season):
+        # The all-time top k can only hold each year's own top k
+        losses = _narrowest_weeks(season, self.k)
+        for loss in losses:
+            loss["year"] = season.year
+        self.per_year[season.year] = losses
 
-        # Store the top 5 narrowest losses for the year
-        narrowest_losses_per_year[year] = top_5_diffs
+    def year_result(self, year):
+        return self.per_year[year]
 
-    return narrowest_losses_per_year
+    def load_year_result(self, year, value):
+        self.per_year[year] = value
 
+    def result(self):
+        # Stream-merge the sorted per-year lists and stop after k
+        merged = heapq.merge(*self.per_year.values(), key=lambda x: x["difference"])
+        return list(itertools.islice(merged, self.k))
 
-if __name__ == "__main__":
-    file_name = ["espn_user_info.json", "sleeper_user_info.json"]
 
-    final_player = {}
+def _unlucky_streaks(season):
+    """
+    Longest run of weeks each user's death score would have survived, as a (user,) array.
+
+    A week counts when the score the user died with beats that week's eliminated
+    (lowest) score. Users who never died get -1.
+    """
+    weekly = season.weekly
+    died = season.present & ~np.isnan(season.death_weeks)
+    death_index = np.where(died, np.nan_to_num(season.death_weeks) - 1, 0).astype(int)
+    death_scores = np.take_along_axis(season.scores, death_index[:, np.newaxis], axis=1)
+
+    # One comparison of every death score against every week's eliminated score
+    eliminated = np.where(_two_live(season), weekly["lowest"], np.inf)
+    survived = death_scores > eliminated[np.newaxis, :]
+
+    # Run length of consecutive Trues: the running count minus its value at the last False
+    count = np.cumsum(survived, axis=1)
+    last_reset = np.maximum.accumulate(np.where(survived, 0, count), axis=1)
+    longest = (count - last_reset).max(axis=1, initial=0)
 
-    espn_to_sleeper_names = load_json("espn_to_sleeper_name_asso.json")
+    return np.where(died, longest, -1), death_scores[:, 0]
 
-    for year in range(2019, 2024):
-        data = load_year(str(year))
-        # print(data)
 
-        year_key_deaths = f"{year}_death_week"
-        year_key_scores = f"{year}_scores"
+def _unluckiest(season):
+    streaks, death_scores = _unlucky_streaks(season)
+    if streaks.size == 0 or streaks.max() < 0:
+        return None
 
-        for user, info in data.items():
-            score_year = info.get("scores", None)
-            death_week = info.get("death_week", None)  # None if no death week
+    user = int(streaks.argmax())
+    return {
+        "player": season.users[user],
+        "streak": int(streaks[user]),
+        "death_week": int(season.death_weeks[user]),
+        "score": float(death_scores[user]),
+    }
 
-            # convert from espn to sleeper
-            if user in espn_to_sleeper_names:
-                user = espn_to_sleeper_names[user]
 
-            # If user is not already in the dictionary, initialize
-            if user not in final_player:
-                final_player[user] = {}
+# Longest run of weeks the score you died with would have survived
+@register_stat("unlucky_streak")
+class UnluckyStreak(PerYearStat):
+    def season_result(self, season):
+        return _unluckiest(season)
 
-            # Store the death week for the corresponding year
-            final_player[user][year] = {"scores": score_year, "death_week": death_week}
 
-    final_player = calculate_avg_death_week(final_player)
+@register_stat("all_time_unlucky_streak")
+class AllTimeUnluckyStreak(PerYearStat):
+    def season_result(self, season):
+        unluckiest = _unluckiest(season)
+        if unluckiest is not None:
+            unluckiest["year"] = season.year
+        return unluckiest
+
+    def result(self):
+        # Longest streak of any year, the earlier year on ties
+        return max(self.per_year.values(), key=lambda x: x["streak"], default=None)
+
+
+def _score_totals(season):
+    # Only weeks the user was alive count toward their average
+    totals = np.where(season.live, season.scores, 0).sum(axis=1)
+    weeks = season.live.sum(axis=1)
+    return {
+        season.users[u]: (float(totals[u]), int(weeks[u])) for u in np.flatnonzero(weeks)
+    }
+
+
+@register_stat("average_score")
+class AverageScore(PerYearStat):
+    def season_result(self, season):
+        return {
+            user: total / weeks for user, (total, weeks) in _score_totals(season).items()
+        }
+
+
+@register_stat("all_time_average_score")
+class AllTimeAverageScore(StatReducer):
+    def __init__(self):
+        self.totals_per_year = {}
+
+    def add_season(self, season):
+        self.totals_per_year[season.year] = _score_totals(season)
+
+    def year_result(self, year):
+        return self.totals_per_year[year]
+
+    def load_year_result(self, year, value):
+        self.totals_per_year[year] = value
+
+    def result(self):
+        total_points = {}
+        total_weeks = {}
+        for totals in self.totals_per_year.values():
+            for user, (points, weeks) in totals.items():
+                total_points[user] = total_points.get(user, 0) + points
+                total_weeks[user] = total_weeks.get(user, 0) + weeks
+
+        return {user: total_points[user] / total_weeks[user] for user in sorted(total_points)}
+
+
+def calculate_avg_death_week(data, matrix):
+    """Calculate the average death week for each user, replacing None with the max death week from their scores."""
+    averages = run_stats(matrix, ["average_death_week"])["average_death_week"]
+
+    for user, average_death_week in averages.items():
+        data[user]["average_death_week"] = average_death_week
+
+    return data
+
+
+def print_sorted_by_best_death_week(data):
+    # Extract the usernames and their average death weeks
+    users_with_avg_death_week = [
+        (user, user_data["average_death_week"]) for user, user_data in data.items()
+    ]
+
+    # Sort by the average death week (lower is better)
+    sorted_users = sorted(users_with_avg_death_week, key=lambda x: x[1], reverse=True)
+
+    # Print the sorted usernames and their average death week
+    for user, avg_death_week in sorted_users:
+        print(f"{user}: Average Death Week = {avg_death_week:.2f}")
+
+def highest_in_year(matrix):
+    return run_stats(matrix, ["highest_in_year"])["highest_in_year"]
+
+def lowest_in_year(matrix):
+    return run_stats(matrix, ["lowest_in_year"])["lowest_in_year"]
+
+def narrowest_loss(matrix, weekly=None):
+    return run_stats(matrix, ["narrowest_loss"], weekly)["narrowest_loss"]
+
+def bye_week(matrix, weekly=None):
+    return run_stats(matrix, ["bye_week"], weekly)["bye_week"]
+
+def david_goliath(matrix, weekly=None):
+    return run_stats(matrix, ["david_goliath"], weekly)["david_goliath"]
+
+def top_narrowest_losses(matrix, k=5, weekly=None):
+    return run_stats(matrix, ["top_narrowest_losses"], weekly, k=k)["top_narrowest_losses"]
+
+def top_5_narrowest_losses(matrix, weekly=None):
+    return top_narrowest_losses(matrix, 5, weekly)
+
+def all_time_narrowest_losses(matrix, k=10, weekly=None):
+    return run_stats(matrix, ["all_time_narrowest_losses"], weekly, all_time_k=k)[
+        "all_time_narrowest_losses"
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print guillotine league stats.")
+    parser.add_argument(
+        "--years",
+        help='seasons to analyze, e.g. "2019-2023", defaults to every year directory',
+    )
+    parser.add_argument(
+        "--top-k", type=int, default=5, help="narrowest losses to list per year"
+    )
+    parser.add_argument(
+        "--all-time-k",
+        type=int,
+        default=10,
+        help="narrowest losses to list across every year",
+    )
+    parser.add_argument(
+        "--db",
+        help="write the history to this SQLite database instead of final_deaths.json",
+    )
+    args = parser.parse_args(argv)
+
+    instrument.start("data_analysis")
+
+    file_name = ["espn_user_info.json", "sleeper_user_info.json"]
+
+    # The hand-maintained mapping plus every ESPN name espn.py matched to a Sleeper user
+    identities = identity.IdentityIndex()
+    if Path("espn_to_sleeper_name_asso.json").exists():
+        identities.add_aliases(load_json("espn_to_sleeper_name_asso.json"))
+    espn_to_sleeper_names = identities.name_map()
+
+    # Store every user's season under their Sleeper name, converting from ESPN
+    lazy = LazyHistory(
+        years=parse_years(args.years) if args.years else None,
+        names=espn_to_sleeper_names,
+    )
+    years = lazy.years
+    history = lazy.history()
+
+    # Build the score matrix once and compute every stat in one pass over it,
+    # reusing the cached results of years whose inputs have not changed
+    matrix = build_score_matrix(history, years)
+    year_digests = {
+        year: stat_cache.year_digest(
+            year, "espn_to_sleeper_name_asso.json", identity.IDENTITY_FILE
+        )
+        for year in years
+    }
+    results = run_stats(
+        matrix,
+        cache=stat_cache.StatCache(),
+        year_digests=year_digests,
+        week_indexes={year: week_index.load_week_index(year) for year in years},
+        aliases=espn_to_sleeper_names,
+        k=args.top_k,
+        all_time_k=args.all_time_k,
+    )
+
+    final_player = history.final_player()
+    for user, average_death_week in results["average_death_week"].items():
+        final_player[user]["average_death_week"] = average_death_week
 
     # Assuming 'updated_data_with_averages' is your data with average death weeks
     print_sorted_by_best_death_week(final_player)
 
-    high_scores = highest_in_year(final_player)
+    high_scores = results["highest_in_year"]
     print("Highest Scores by Year:")
     for year, info in high_scores.items():
         print(f"Year: {year}")
@@ -375,7 +856,7 @@ if __name__ == "__main__":
         print(f"  Week: {info['week']}")
         print()  # Adds a blank line for better readability
     
-    low_scores = lowest_in_year(final_player)
+    low_scores = results["lowest_in_year"]
     print("Lowest Scores by Year:")
     for year, info in low_scores.items():
         print(f"Year: {year}")
@@ -384,7 +865,7 @@ if __name__ == "__main__":
         print(f"  Week: {info['week']}")
         print()  # Adds a blank line for better readability
     
-    narrow_lost = narrowest_loss(final_player)
+    narrow_lost = results["narrowest_loss"]
     print("Narrowest Loss by Year:\n")
     for year, info in narrow_lost.items():
         print(f"Year: {year}")
@@ -394,9 +875,9 @@ if __name__ == "__main__":
         print(f"  Difference: {info['difference']}")
         print()  # Adds a blank line for better readability
     
-    top5_narrow = top_5_narrowest_losses(final_player)
+    top5_narrow = results["top_narrowest_losses"]
     for year, losses in top5_narrow.items():
-        print(f"\nTop 5 Narrowest Losses for {year}:\n")
+        print(f"\nTop {args.top_k} Narrowest Losses for {year}:\n")
         for i, loss in enumerate(losses, start=1):
             week = loss["week"]
             players = loss["players"]
@@ -406,7 +887,15 @@ if __name__ == "__main__":
             print(f"     Score Difference: {difference:.2f}")
         print("-" * 40)
 
-    largest_gap = bye_week(final_player)
+    print(f"\nAll-Time Top {args.all_time_k} Narrowest Losses:\n")
+    for i, loss in enumerate(results["all_time_narrowest_losses"], start=1):
+        players = loss["players"]
+        print(f"  {i}. {loss['year']} Week {loss['week']}:")
+        print(f"     Players: {players[0]} vs {players[1]}")
+        print(f"     Score Difference: {loss['difference']:.2f}")
+    print("-" * 40)
+
+    largest_gap = results["bye_week"]
     print("Bye Week Loss by Year:\n")
     for year, info in largest_gap.items():
         print(f"Year: {year}")
@@ -416,7 +905,7 @@ if __name__ == "__main__":
         print(f"  Difference: {info['difference']}")
         print()  # Adds a blank line for better readability
     
-    largest_gap = david_goliath(final_player)
+    largest_gap = results["david_goliath"]
     print("Largest Gap (Highest and Lowest) by Year:\n")
     for year, info in largest_gap.items():
         print(f"Year: {year}")
@@ -425,7 +914,46 @@ if __name__ == "__main__":
         print(f"  Second Lowest Player: {info['second lowest']}")
         print(f"  Difference: {info['difference']}")
         print()  # Adds a blank line for better readability
-    
 
+    print("Unlucky Streak by Year:\n")
+    for year, info in results["unlucky_streak"].items():
+        print(f"Year: {year}")
+        print(f"  Player: {info['player']}")
+        print(f"  Death Week: {info['death_week']} ({info['score']})")
+        print(f"  Streak: {info['streak']} weeks")
+        print()  # Adds a blank line for better readability
 
-    save_to_json(final_player, "final_deaths.json")
+    unluckiest = results["all_time_unlucky_streak"]
+    if unluckiest is not None:
+        print(
+            f"All-Time Unlucky Streak: {unluckiest['player']} "
+            f"({unluckiest['year']} Week {unluckiest['death_week']}) "
+            f"- {unluckiest['streak']} weeks\n"
+        )
+
+    print("Average Score by Year:\n")
+    for year, averages in results["average_score"].items():
+        print(f"Year: {year}")
+        for user, average in sorted(averages.items(), key=lambda x: x[1], reverse=True):
+            print(f"  {user}: {average:.2f}")
+        print()  # Adds a blank line for better readability
+
+    print("All-Time Average Score:\n")
+    all_time_averages = results["all_time_average_score"]
+    for user, average in sorted(all_time_averages.items(), key=lambda x: x[1], reverse=True):
+        print(f"  {user}: {average:.2f}")
+    print()
+
+    if args.db:
+        import history_db
+
+        conn = history_db.connect(args.db)
+        with instrument.stage("analysis.write_db"):
+            history_db.write_history(conn, history)
+        conn.close()
+    else:
+        save_to_json(final_player, "final_deaths.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,69 @@
-# Football API
-from espn_api.football import League
-
-import requests
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from utils import save_to_json, load_json
+import instrument
+from identity import IdentityIndex
+from models import SeasonRecord
+from utils import json_path, save_to_json, load_json, map_years, parse_years
+from week_index import write_week_index
 
-from dotenv import load_dotenv
 import os
 
 
-def user_info(league) -> dict:
-    roster_user_map = {}
+# Seasons refreshed or reprocessed when ESPN_YEARS is not set
+DEFAULT_YEARS = "2019-2022"
+
+# League objects loaded from ESPN at once
+MAX_WORKERS = 8
+
+# Hand-maintained ESPN to Sleeper name mapping
+ALIAS_FILE = "espn_to_sleeper_name_asso.json"
 
-    for x in range(len(league.teams)):
-        team = league.teams[x]
-        owners = team.owners
-        full_name = owners[0]["firstName"] + " " + owners[0]["lastName"]
-        total_weeks = len(team.scores)
-        min_week = [0] * total_weeks
 
+@instrument.timed("ingest.user_info")
+def user_records(league) -> list:
+    """One SeasonRecord per team in the league's season, named after the first owner."""
+    records = []
+
+    for team in league.teams:
+        owner = team.owners[0]
+        full_name = owner["firstName"] + " " + owner["lastName"]
         scores = team.scores
-        x, y = 0, 1
-        while y < total_weeks and scores[y] != 0:
-            y += 1
 
-        x = y - 1
-        min_week[x] = scores[x]
+        # Death week is the week before the first zero after week 1, or the last week
+        death_week = next(
+            (week for week in range(1, len(scores)) if scores[week] == 0),
+            max(len(scores), 1),
+        )
+
+        records.append(SeasonRecord(full_name, league.year, scores, death_week))
+
+    return records
+
 
-        roster_user_map[full_name] = {"scores": scores, "death_week": y}
+def user_info(league) -> dict:
+    return {record.user: record.to_dict() for record in user_records(league)}
+
+
+@instrument.timed("fetch.espn_leagues")
+def load_leagues(league_id, years, espn_s2, swid, max_workers=MAX_WORKERS):
+    """Build the League for every year at once, each one loads its season from ESPN."""
+    years = list(years)
+    if not years:
+        return {}
+
+    # espn_api pulls in its own requests stack, only load it when fetching
+    from espn_api.football import League
 
-    return roster_user_map
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(years))) as executor:
+        leagues = executor.map(
+            lambda year: League(
+                league_id=league_id, year=year, espn_s2=espn_s2, swid=swid
+            ),
+            years,
+        )
+        return dict(zip(years, leagues))
 
 
 def death_week(roster) -> list:
@@ -63,7 +96,7 @@ def champion(users):
     return champion_name
 
 
-def retrieve_info_espn(league):
+def retrieve_info_espn(league, year):
     # Retrieves info regarding every member
     save_to_json(league.members, f"{year}/members")
 
@@ -72,38 +105,94 @@ def retrieve_info_espn(league):
     save_to_json(roster_info, f"{year}/espn_user_info.json")
 
 
-def update_info(roster, champion):
+def update_info(roster, champion, year):
     # Update the death_week of the champion to None (equivalent to null in JSON)
     roster[champion]["death_week"] = None
     save_to_json(roster, f"{year}/espn_user_info.json")
 
 
-if __name__ == "__main__":
+@instrument.timed("ingest.process_year")
+def process_year(year):
+    """Rank one year's saved ESPN user info and mark its champion. Returns the champion."""
+    roster_path = f"{year}/espn_user_info.json"
+
+    roster_info_retieval = load_json(roster_path)
+
+    user_sorted = death_week(roster_info_retieval)
+
+    champion_name = champion(user_sorted)
+
+    update_info(roster_info_retieval, champion_name, year)
+
+    # Weekly lowest/second lowest/highest for instant per-week lookups
+    write_week_index(year, roster_info_retieval)
+
+    return champion_name
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh ESPN guillotine data.")
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="download every season in ESPN_YEARS from ESPN before ranking",
+    )
+    args = parser.parse_args(argv)
+
+    instrument.start("espn")
+
+    from dotenv import load_dotenv
 
     load_dotenv("website.env")
     league_id = os.getenv("ESPN_LEAGUE_ID")
     espn_s2 = os.getenv("ESPN_S2")
     swid = os.getenv("ESPN_SWID")
-
-    league = League(league_id=league_id, year=2022, espn_s2=espn_s2, swid=swid)
+    years = parse_years(os.getenv("ESPN_YEARS", DEFAULT_YEARS))
 
     # print(len(matchups))
     # print(matchups)
     # print(matchups[0].away_score)
 
-    for year in range(2019, 2023):
+    processes = int(os.getenv("INGEST_PROCESSES", 0)) or None
+
+    for year in years:
         # Create the directory if it doesn't exist
         Path(str(year)).mkdir(parents=True, exist_ok=True)
         print(f"Directory '{year}' created or already exists.")
 
-        # league = League(league_id=league_id, year=year, espn_s2=espn_s2, swid=swid)
-
-        roster_path = f"{year}/espn_user_info.json"
+    if args.backfill:
+        # Load every season's League at once, then write each year's files
+        leagues = load_leagues(league_id, years, espn_s2, swid)
+        for year, league in leagues.items():
+            retrieve_info_espn(league, year)
+
+    # Archived seasons are finished and already ranked, re-ranking would unarchive
+    # them, unless --backfill just wrote them again
+    ranked = [
+        year
+        for year in years
+        if json_path(f"{year}/espn_user_info.json").suffix == ".json"
+    ]
+
+    # Every year is independent, so rank them in parallel
+    map_years(process_year, {year: (year,) for year in ranked}, processes)
+
+    # Match ESPN owners to their Sleeper names once, later runs reuse the result
+    identities = IdentityIndex()
+    if Path(ALIAS_FILE).exists():
+        identities.add_aliases(load_json(ALIAS_FILE))
+    if args.backfill:
+        for league in leagues.values():
+            for team in league.teams:
+                owner = team.owners[0]
+                identities.add_espn_owner(
+                    owner["id"], owner["firstName"] + " " + owner["lastName"]
+                )
+    for year in years:
+        for name in load_json(f"{year}/espn_user_info.json"):
+            identities.resolve(name)
+    identities.save()
 
-        roster_info_retieval = load_json(roster_path)
 
-        user_sorted = death_week(roster_info_retieval)
-
-        champion_name = champion(user_sorted)
-
-        update_info(roster_info_retieval, champion_name)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import instrument
+
+# Default number of requests allowed in flight at once
+MAX_WORKERS = 8
+
+# Rate limits and server errors are retried with exponential backoff
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+RETRY_TOTAL = 5
+RETRY_BACKOFF = 0.5
+
+
+def _count_response(response, *args, **kwargs):
+    # Only responses that actually went over the network reach this hook
+    instrument.count("http.requests")
+    instrument.count(f"http.status_{response.status_code}")
+    instrument.count("http.bytes", len(response.content))
+
+
+def make_session(max_workers=MAX_WORKERS, cache_dir=None):
+    """
+    Create one pooled session that retries 429/5xx responses with backoff.
+
+    :param max_workers: Number of connections to keep open
+    :param cache_dir: Keep responses in this directory (see http_cache.CachedSession)
+    """
+    # Imported here so scripts that only reprocess local files never load requests
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    from http_cache import CachedSession
+
+    retry = Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+        # Hand the last response back instead of raising so callers can check the status
+        raise_on_status=False,
+    )
+    # Keep a connection per worker so concurrent requests reuse sockets
+    adapter = HTTPAdapter(
+        pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry
+    )
+
+    session = CachedSession(cache_dir) if cache_dir else requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.hooks["response"].append(_count_response)
+    return session
+
+
+def fetch_concurrently(fetch, jobs, max_workers=MAX_WORKERS):
+    """
+    Run fetch(job) for every job with at most max_workers requests in flight.
+
+    :param fetch: Function making one request
+    :param jobs: Arguments passed to fetch, one per request
+    :param max_workers: Concurrency limit
+    :return: List of results in the same order as jobs
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return []
+
+    with instrument.stage("fetch.concurrent"):
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+            return list(executor.map(fetch, jobs))
@@ -0,0 +1,275 @@
+import itertools
+import sqlite3
+
+from models import LeagueHistory, SeasonRecord
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS leagues (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS seasons (
+    league_id INTEGER NOT NULL REFERENCES leagues (id),
+    year INTEGER NOT NULL,
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    death_week INTEGER,
+    weeks INTEGER NOT NULL,
+    PRIMARY KEY (league_id, year, user_id)
+);
+CREATE TABLE IF NOT EXISTS weekly_scores (
+    league_id INTEGER NOT NULL REFERENCES leagues (id),
+    year INTEGER NOT NULL,
+    week INTEGER NOT NULL,
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    score REAL NOT NULL,
+    PRIMARY KEY (league_id, year, week, user_id)
+);
+CREATE INDEX IF NOT EXISTS ix_weekly_scores_year_week ON weekly_scores (year, week);
+CREATE INDEX IF NOT EXISTS ix_weekly_scores_user ON weekly_scores (user_id);
+CREATE INDEX IF NOT EXISTS ix_seasons_user ON seasons (user_id);
+"""
+
+# Lowest, second lowest and highest live score of every week with at least two live teams.
+# Ties resolve by name, the same way data_analysis's weekly extremes do.
+WEEKS_CTE = """
+WITH live AS (
+    SELECT w.league_id, w.year, w.week, u.name, w.score,
+           ROW_NUMBER() OVER (
+               PARTITION BY w.league_id, w.year, w.week ORDER BY w.score, u.name
+           ) AS low_rank,
+           ROW_NUMBER() OVER (
+               PARTITION BY w.league_id, w.year, w.week ORDER BY w.score DESC, u.name DESC
+           ) AS high_rank,
+           COUNT(*) OVER (PARTITION BY w.league_id, w.year, w.week) AS live_count
+    FROM weekly_scores w
+    JOIN users u ON u.id = w.user_id
+    WHERE w.score > 0 AND w.league_id = :league_id
+),
+weeks AS (
+    SELECT year, week,
+           MAX(CASE WHEN low_rank = 1 THEN name END) AS lowest_user,
+           MAX(CASE WHEN low_rank = 1 THEN score END) AS lowest,
+           MAX(CASE WHEN low_rank = 2 THEN name END) AS second_user,
+           MAX(CASE WHEN low_rank = 2 THEN score END) AS second_lowest,
+           MAX(CASE WHEN high_rank = 1 THEN name END) AS highest_user,
+           MAX(CASE WHEN high_rank = 1 THEN score END) AS highest
+    FROM live
+    WHERE live_count >= 2
+    GROUP BY year, week
+)
+"""
+
+
+def connect(path="history.db"):
+    """Open (and create if needed) the history database."""
+    conn = sqlite3.connect(path)
+    # Write-ahead logging lets dashboards read while a refresh writes
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _ids(conn, table, names):
+    conn.executemany(
+        f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", ((name,) for name in names)
+    )
+    return dict(conn.execute(f"SELECT name, id FROM {table}"))
+
+
+def write_history(conn, history, league="default"):
+    """
+    Replace the league's seasons in the database with a LeagueHistory.
+
+    Everything is inserted in bulk inside a single transaction.
+    """
+    with conn:
+        league_id = _ids(conn, "leagues", [league])[league]
+        user_ids = _ids(conn, "users", history.users())
+
+        years = history.years()
+        for table in ("seasons", "weekly_scores"):
+            conn.executemany(
+                f"DELETE FROM {table} WHERE league_id = ? AND year = ?",
+                ((league_id, year) for year in years),
+            )
+
+        records = [record for year in years for record in history.by_year[year].values()]
+        conn.executemany(
+            "INSERT INTO seasons (league_id, year, user_id, death_week, weeks) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                (league_id, r.year, user_ids[r.user], r.death_week, len(r.scores))
+                for r in records
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO weekly_scores (league_id, year, week, user_id, score) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                (league_id, r.year, week, user_ids[r.user], float(score))
+                for r in records
+                for week, score in enumerate(r.scores, start=1)
+            ),
+        )
+
+
+def _league_id(conn, league):
+    row = conn.execute("SELECT id FROM leagues WHERE name = ?", (league,)).fetchone()
+    return None if row is None else row[0]
+
+
+def _records(conn, where, params):
+    rows = conn.execute(
+        "SELECT s.year, u.name, s.death_week, w.score "
+        "FROM seasons s "
+        "JOIN users u ON u.id = s.user_id "
+        "LEFT JOIN weekly_scores w ON w.league_id = s.league_id AND w.year = s.year "
+        "AND w.user_id = s.user_id "
+        f"WHERE {where} ORDER BY s.league_id, s.year, u.name, w.week",
+        params,
+    )
+
+    history = LeagueHistory()
+    for (year, user, death_week), season in itertools.groupby(rows, key=lambda x: x[:3]):
+        scores = [score for *_, score in season if score is not None]
+        history.add(SeasonRecord(user, year, scores, death_week))
+    return history
+
+
+def load_history(conn, league="default"):
+    """Every season of a league as a LeagueHistory."""
+    return _records(conn, "s.league_id = ?", (_league_id(conn, league),))
+
+
+def load_user(conn, user, league="default"):
+    """One user's seasons, read through the user index."""
+    return _records(conn, "u.name = ? AND s.league_id = ?", (user, _league_id(conn, league)))
+
+
+def load_week(conn, year, week, league="default"):
+    """{user: score} for one week, read through the (year, week) index."""
+    return dict(
+        conn.execute(
+            "SELECT u.name, w.score FROM weekly_scores w JOIN users u ON u.id = w.user_id "
+            "WHERE w.year = ? AND w.week = ? AND w.league_id = ?",
+            (year, week, _league_id(conn, league)),
+        )
+    )
+
+
+def _ranked_weeks(conn, league, difference, descending=False, where="1"):
+    return conn.execute(
+        WEEKS_CTE
+        + f"""
+        SELECT year, week, lowest_user, lowest, second_user, second_lowest,
+               highest_user, highest, {difference} AS difference,
+               ROW_NUMBER() OVER (
+                   PARTITION BY year ORDER BY {difference} {"DESC" if descending else ""}, week
+               ) AS rank
+        FROM weeks
+        WHERE {where}
+        """,
+        {"league_id": _league_id(conn, league)},
+    ).fetchall()
+
+
+def narrowest_loss(conn, league="default"):
+    result = {}
+    for row in _ranked_weeks(conn, league, "second_lowest - lowest"):
+        year, week, low_user, low, second_user, second, _, _, diff, rank = row
+        if rank == 1:
+            result[year] = {
+                "week": week,
+                "lowest": (low_user, low),
+                "second lowest": (second_user, second),
+                "difference": diff,
+            }
+    return result
+
+
+def bye_week(conn, league="default"):
+    result = {}
+    rows = _ranked_weeks(
+        conn, league, "second_lowest - lowest", True, "second_lowest > lowest"
+    )
+    for year, week, low_user, low, second_user, second, _, _, diff, rank in rows:
+        if rank == 1:
+            result[year] = {
+                "week": week,
+                "lowest": (low_user, low),
+                "second lowest": (second_user, second),
+                "difference": diff,
+            }
+    return result
+
+
+def david_goliath(conn, league="default"):
+    result = {}
+    rows = _ranked_weeks(conn, league, "highest - lowest", True, "highest > lowest")
+    for year, week, low_user, low, _, _, high_user, high, diff, rank in rows:
+        if rank == 1:
+            result[year] = {
+                "week": week,
+                "lowest": (low_user, low),
+                "second lowest": (high_user, high),
+                "difference": diff,
+            }
+    return result
+
+
+def top_narrowest_losses(conn, k=5, league="default"):
+    result = {}
+    for row in _ranked_weeks(conn, league, "second_lowest - lowest"):
+        year, week, low_user, _, second_user, _, _, _, diff, rank = row
+        if rank <= k:
+            result.setdefault(year, []).append(
+                {"week": week, "players": (low_user, second_user), "difference": diff}
+            )
+    return result
+
+
+def _extreme_in_year(conn, league, order):
+    return conn.execute(
+        f"""
+        SELECT year, name, score, week FROM (
+            SELECT w.year, u.name, w.score, w.week,
+                   ROW_NUMBER() OVER (PARTITION BY w.year ORDER BY {order}, u.name, w.week) AS rank
+            FROM weekly_scores w JOIN users u ON u.id = w.user_id
+            WHERE w.score > 0 AND w.league_id = ?
+        )
+        WHERE rank = 1
+        ORDER BY year
+        """,
+        (_league_id(conn, league),),
+    ).fetchall()
+
+
+def highest_in_year(conn, league="default"):
+    return {
+        year: {"player": user, "score": score, "week": week}
+        for year, user, score, week in _extreme_in_year(conn, league, "w.score DESC")
+    }
+
+
+def lowest_in_year(conn, league="default"):
+    return {
+        year: {"player": user, "score": score, "week": week}
+        for year, user, score, week in _extreme_in_year(conn, league, "w.score")
+    }
+
+
+def average_death_week(conn, league="default"):
+    """Average death week per user, counting the champion's season as all of its weeks."""
+    return dict(
+        conn.execute(
+            "SELECT u.name, AVG(COALESCE(s.death_week, s.weeks)) "
+            "FROM seasons s JOIN users u ON u.id = s.user_id "
+            "WHERE s.league_id = ? GROUP BY u.name ORDER BY u.name",
+            (_league_id(conn, league),),
+        )
+    )
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+import instrument
+
+# Default cache size before the least recently used responses are evicted
+MAX_BYTES = 256 * 1024 * 1024
+
+
+class CachedSession(requests.Session):
+    """
+    Session that keeps GET responses on disk, keyed by URL.
+
+    Cached responses are revalidated with If-None-Match/If-Modified-Since so an
+    unchanged resource costs a 304 instead of a full download. URLs under a
+    prefix given a max age are served straight from disk while still fresh, and
+    prefixes marked immutable (finished seasons) are never requested again once
+    cached after the point they stopped changing. The store is bounded by size
+    with least recently used eviction.
+    """
+
+    def __init__(self, cache_dir=".sleeper_cache", max_bytes=MAX_BYTES):
+        super().__init__()
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_ages = {}  # URL prefix -> seconds a cached response stays fresh
+        self.immutable = {}  # URL prefix -> time after which its responses are final
+
+        self._lock = threading.Lock()
+        self._index_path = self.cache_dir / "index.json"
+        self._index = self._load_index()
+        self.hits = 0
+        self.misses = 0
+
+    def mark_immutable(self, prefix, since=0):
+        """
+        Never revalidate cached responses whose URL starts with prefix.
+
+        :param since: Timestamp the resources stopped changing, e.g. a season's end;
+            responses cached before it are revalidated once more before being kept
+        """
+        self.immutable[prefix] = since
+
+    def set_max_age(self, prefix, seconds):
+        """Serve cached responses under prefix without a request for this many seconds."""
+        self.max_ages[prefix] = seconds
+
+    def get(self, url, **kwargs):
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is not None and not (self.cache_dir / entry["file"]).exists():
+                self._drop(url)
+                entry = None
+
+        if entry is not None and self._is_fresh(url, entry):
+            return self._cached_response(url, entry)
+
+        # Send a conditional request when we already hold a copy
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = super().get(url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            with self._lock:
+                entry["stored"] = time.time()
+            instrument.count("http_cache.not_modified")
+            return self._cached_response(url, entry)
+
+        if response.status_code == 200:
+            self._store(url, response)
+
+        self.misses += 1
+        return response
+
+    def close(self):
+        self.save()
+        super().close()
+
+    def save(self):
+        """Write the cache index to disk."""
+        with self._lock:
+            tmp_path = self._index_path.with_suffix(".tmp")
+            with open(tmp_path, "w") as index_file:
+                json.dump(self._index, index_file)
+            tmp_path.replace(self._index_path)
+
+    def _load_index(self):
+        index = {}
+        if self._index_path.exists():
+            try:
+                with open(self._index_path, "r") as index_file:
+                    index = json.load(index_file)
+            except (OSError, ValueError):
+                # A corrupt index only costs us a refetch
+                index = {}
+
+        # A run that died before saving its index leaves files nothing would ever
+        # evict, remove them so the cache stays within max_bytes
+        listed = {entry["file"] for entry in index.values()}
+        for path in self.cache_dir.iterdir():
+            if path.is_file() and path != self._index_path and path.name not in listed:
+                path.unlink(missing_ok=True)
+        return index
+
+    def _is_fresh(self, url, entry):
+        for prefix, since in self.immutable.items():
+            if url.startswith(prefix) and entry["stored"] >= since:
+                return True
+
+        max_age = 0
+        for prefix, seconds in self.max_ages.items():
+            if url.startswith(prefix):
+                max_age = max(max_age, seconds)
+
+        return time.time() - entry["stored"] < max_age
+
+    def _cached_response(self, url, entry):
+        with self._lock:
+            entry["last_used"] = time.time()
+            self.hits += 1
+        instrument.count("http_cache.hits")
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = (self.cache_dir / entry["file"]).read_bytes()
+        response.headers["Content-Type"] = entry.get("content_type") or ""
+        return response
+
+    def _store(self, url, response):
+        file_name = hashlib.sha256(url.encode()).hexdigest()
+        (self.cache_dir / file_name).write_bytes(response.content)
+
+        now = time.time()
+        with self._lock:
+            self._index[url] = {
+                "file": file_name,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "content_type": response.headers.get("Content-Type"),
+                "size": len(response.content),
+                "stored": now,
+                "last_used": now,
+            }
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        total = sum(entry["size"] for entry in self._index.values())
+        if total <= self.max_bytes:
+            return
+
+        for url, entry in sorted(self._index.items(), key=lambda x: x[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= entry["size"]
+            self._drop(url)
+
+    def _drop(self, url):
+        entry = self._index.pop(url)
+        (self.cache_dir / entry["file"]).unlink(missing_ok=True)
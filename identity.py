@@ -0,0 +1,108 @@
+import difflib
+from pathlib import Path
+
+from utils import load_json, save_to_json
+
+# Saved next to final_deaths.json
+IDENTITY_FILE = "identities.json"
+
+# Minimum difflib similarity for an unseen name to be treated as a known user
+MATCH_CUTOFF = 0.85
+
+
+class IdentityIndex:
+    """
+    Persistent map from ESPN owner ids, Sleeper user ids and alternate names to one canonical user.
+
+    Sleeper display names are the canonical names, as in final_deaths.json. Names
+    listed in espn_to_sleeper_name_asso.json always win; any other unseen name is
+    matched against the canonical names once with difflib and the result is kept,
+    so the similarity search never runs twice for the same name.
+    """
+
+    def __init__(self, path=IDENTITY_FILE, cutoff=MATCH_CUTOFF):
+        self.path = Path(path)
+        self.cutoff = cutoff
+
+        data = load_json(self.path) if self.path.exists() else {}
+        self.sleeper = data.get("sleeper", {})  # Sleeper user id -> {"display_name": ...}
+        self.espn = data.get("espn", {})  # ESPN owner id -> canonical name
+        self.aliases = data.get("aliases", {})  # alternate name -> canonical name
+        self.matches = data.get("matches", {})  # unseen name -> fuzzy match, None if none
+
+        self._canonical = {info["display_name"] for info in self.sleeper.values()}
+        self._canonical.update(self.aliases.values())
+        self._changed = False
+
+    def add_aliases(self, aliases):
+        """Add hand-maintained {alternate name: canonical name} pairs."""
+        for name, canonical in aliases.items():
+            if self.aliases.get(name) != canonical:
+                self.aliases[name] = canonical
+                self.matches.pop(name, None)
+                self._add_canonical(canonical)
+                self._changed = True
+
+    def sleeper_user(self, user_id):
+        """Cached user info for a Sleeper user id, or None if the owner is unknown."""
+        return self.sleeper.get(user_id)
+
+    def add_sleeper_user(self, user_id, user_info):
+        """Remember a fetched Sleeper user so it is never requested again."""
+        info = {"display_name": user_info.get("display_name")}
+        if self.sleeper.get(user_id) != info:
+            self.sleeper[user_id] = info
+            self._changed = True
+            if info["display_name"] is not None:
+                self._add_canonical(info["display_name"])
+        return info
+
+    def add_espn_owner(self, owner_id, name):
+        """Record which canonical user an ESPN owner id is. Returns the canonical name."""
+        canonical = self.resolve(name)
+        if self.espn.get(owner_id) != canonical:
+            self.espn[owner_id] = canonical
+            self._changed = True
+        return canonical
+
+    def resolve(self, name):
+        """Canonical name for any user name, the name itself when nothing matches."""
+        if name in self.aliases:
+            return self.aliases[name]
+        if name in self._canonical:
+            return name
+
+        if name not in self.matches:
+            close = difflib.get_close_matches(
+                name, sorted(self._canonical), n=1, cutoff=self.cutoff
+            )
+            self.matches[name] = close[0] if close else None
+            self._changed = True
+
+        return self.matches[name] or name
+
+    def name_map(self):
+        """{alternate name: canonical name} for LazyHistory and run_stats."""
+        names = {name: match for name, match in self.matches.items() if match}
+        names.update(self.aliases)
+        return names
+
+    def save(self):
+        if not self._changed:
+            return
+        save_to_json(
+            {
+                "sleeper": self.sleeper,
+                "espn": self.espn,
+                "aliases": self.aliases,
+                "matches": self.matches,
+            },
+            self.path,
+        )
+        self._changed = False
+
+    def _add_canonical(self, name):
+        if name not in self._canonical:
+            self._canonical.add(name)
+            # Names that matched nobody may match the new user
+            self.matches = {k: v for k, v in self.matches.items() if v is not None}
@@ -0,0 +1,111 @@
+import atexit
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Stage name -> {"calls": n, "seconds": total}, and counter name -> total
+_stages = {}
+_counters = {}
+_lock = threading.Lock()
+
+
+def _add_stage(name, seconds, calls=1):
+    with _lock:
+        entry = _stages.setdefault(name, {"calls": 0, "seconds": 0.0})
+        entry["calls"] += calls
+        entry["seconds"] += seconds
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block under the given stage name."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add_stage(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator timing every call of a function under the given stage name."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name, amount=1):
+    """Add to a counter such as http.requests, http.bytes or json.records."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def snapshot():
+    """Copy of the stages and counters recorded so far."""
+    with _lock:
+        return {
+            "stages": {name: dict(entry) for name, entry in _stages.items()},
+            "counters": dict(_counters),
+        }
+
+
+def merge(other):
+    """Fold a snapshot from another process (e.g. a map_years worker) into this one."""
+    for name, entry in other["stages"].items():
+        _add_stage(name, entry["seconds"], entry["calls"])
+    for name, amount in other["counters"].items():
+        count(name, amount)
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def start(name):
+    """
+    Instrument a __main__ run and write {name}_metrics.json when it exits.
+
+    Set GUILLOTINE_METRICS to write the summary elsewhere, GUILLOTINE_PROFILE=1 to
+    also dump cProfile stats to {name}.prof and GUILLOTINE_TRACEMALLOC=1 to record
+    peak Python memory.
+    """
+    profiler = None
+    if os.getenv("GUILLOTINE_PROFILE"):
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    if os.getenv("GUILLOTINE_TRACEMALLOC"):
+        tracemalloc.start()
+
+    started = time.perf_counter()
+
+    def finish():
+        summary = {"run": name, "seconds": time.perf_counter() - started}
+        summary.update(snapshot())
+
+        if tracemalloc.is_tracing():
+            summary["peak_memory_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+
+        if profiler is not None:
+            profiler.disable()
+            summary["profile"] = f"{name}.prof"
+            profiler.dump_stats(summary["profile"])
+
+        with open(os.getenv("GUILLOTINE_METRICS") or f"{name}_metrics.json", "w") as f:
+            json.dump(summary, f, indent=4)
+
+    atexit.register(finish)
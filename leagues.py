@@ -0,0 +1,247 @@
+import argparse
+import heapq
+import itertools
+import os
+from pathlib import Path
+
+import data_analysis
+import identity
+import instrument
+import stat_cache
+import week_index
+from utils import load_json, map_years, save_to_json
+
+# {league name: {"platform": "sleeper" or "espn", "years": {year: league ID}}}
+MANIFEST = "leagues.json"
+
+# Every league's year directories live under LEAGUES_DIR/<league name>/<year>/
+LEAGUES_DIR = "leagues"
+
+REPORT_FILE = "leagues_report.json"
+
+ALIAS_FILE = "espn_to_sleeper_name_asso.json"
+
+
+def year_dirs(manifest, root=LEAGUES_DIR, platform=None):
+    """{year directory: league ID} for the manifest's leagues, e.g. leagues/main/2023."""
+    return {
+        str(Path(root) / name / str(year)): league_id
+        for name, league in manifest.items()
+        if platform is None or league.get("platform", "sleeper") == platform
+        for year, league_id in league["years"].items()
+    }
+
+
+def load_identities():
+    """The identity index, seeded from the hand-maintained aliases."""
+    identities = identity.IdentityIndex()
+    if Path(ALIAS_FILE).exists():
+        identities.add_aliases(load_json(ALIAS_FILE))
+    return identities
+
+
+def fetch(manifest, root=LEAGUES_DIR, incremental=False, pipeline=False):
+    """
+    Refresh every league of the manifest in one batch.
+
+    All Sleeper leagues share one pooled, cached session and one identity index,
+    so owners playing in several leagues are looked up once.
+    """
+    import sleeper
+    from fetch import MAX_WORKERS, make_session
+
+    max_workers = int(os.getenv("SLEEPER_MAX_WORKERS", MAX_WORKERS))
+    processes = int(os.getenv("INGEST_PROCESSES", 0)) or None
+    identities = load_identities()
+
+    for year_dir in year_dirs(manifest, root):
+        Path(year_dir).mkdir(parents=True, exist_ok=True)
+
+    sleeper_years = year_dirs(manifest, root, "sleeper")
+    if sleeper_years:
+        session = make_session(
+            max_workers, cache_dir=os.getenv("SLEEPER_CACHE_DIR", ".sleeper_cache")
+        )
+        sleeper.cache_policy(session, sleeper_years)
+        sleeper.refresh_years(
+            sleeper_years,
+            session,
+            max_workers,
+            processes,
+            identities,
+            incremental=incremental,
+            pipeline=pipeline,
+        )
+        session.close()
+
+    espn_years = year_dirs(manifest, root, "espn")
+    if espn_years:
+        import espn
+
+        espn_s2, swid = os.getenv("ESPN_S2"), os.getenv("ESPN_SWID")
+
+        # One League load per ESPN league and season, then rank every year at once
+        by_league = {}
+        for year_dir, league_id in espn_years.items():
+            by_league.setdefault(league_id, []).append(year_dir)
+        for league_id, dirs in by_league.items():
+            seasons = {sleeper.season_year(year_dir): year_dir for year_dir in dirs}
+            leagues = espn.load_leagues(league_id, list(seasons), espn_s2, swid)
+            for year, league in leagues.items():
+                espn.retrieve_info_espn(league, seasons[year])
+
+        map_years(espn.process_year, {d: (d,) for d in espn_years}, processes)
+
+        for year_dir in espn_years:
+            for name in load_json(f"{year_dir}/espn_user_info.json"):
+                identities.resolve(name)
+
+    identities.save()
+
+
+def analyze(manifest, root=LEAGUES_DIR, names=None, **options):
+    """
+    Run every stat over every league of the manifest.
+
+    Each league is read lazily one year at a time, and each league has its own
+    stat cache, so unchanged years of any league are not recomputed.
+
+    :param options: Stat options such as k and all_time_k
+    :return: Dict of {league name: {stat name: result}}
+    """
+    results = {}
+
+    for name in manifest:
+        # Entries are keyed by stat and year, which leagues share, so one directory each
+        cache = stat_cache.StatCache(Path(stat_cache.CACHE_DIR) / name)
+        history = data_analysis.LazyHistory(Path(root) / name, league=name, names=names)
+        year_paths = {year: history.root / str(year) for year in history.years}
+
+        with instrument.stage("leagues.analyze"):
+            results[name] = data_analysis.run_stats_lazy(
+                history,
+                cache=cache,
+                year_digests={
+                    year: stat_cache.year_digest(path, ALIAS_FILE, identity.IDENTITY_FILE)
+                    for year, path in year_paths.items()
+                },
+                week_indexes={
+                    year: week_index.load_week_index(path)
+                    for year, path in year_paths.items()
+                },
+                aliases=names,
+                **options,
+            )
+
+    return results
+
+
+def combined_leaderboards(results, k=10):
+    """Top k of the headline stats across every league, each entry tagged with its league."""
+    narrowest = heapq.merge(
+        *(
+            [dict(loss, league=name) for loss in stats["all_time_narrowest_losses"]]
+            for name, stats in results.items()
+        ),
+        key=lambda x: x["difference"],
+    )
+
+    def top(entries, key):
+        return heapq.nlargest(k, entries, key=lambda x: x[key])
+
+    return {
+        "narrowest_losses": list(itertools.islice(narrowest, k)),
+        "highest_scores": top(
+            (
+                dict(info, league=name, year=year)
+                for name, stats in results.items()
+                for year, info in stats["highest_in_year"].items()
+            ),
+            "score",
+        ),
+        "average_death_week": top(
+            (
+                {"league": name, "player": user, "average_death_week": average}
+                for name, stats in results.items()
+                for user, average in stats["average_death_week"].items()
+            ),
+            "average_death_week",
+        ),
+        "average_score": top(
+            (
+                {"league": name, "player": user, "average_score": average}
+                for name, stats in results.items()
+                for user, average in stats["all_time_average_score"].items()
+            ),
+            "average_score",
+        ),
+        "unlucky_streaks": top(
+            (
+                dict(stats["all_time_unlucky_streak"], league=name)
+                for name, stats in results.items()
+                if stats["all_time_unlucky_streak"] is not None
+            ),
+            "streak",
+        ),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Guillotine stats across many leagues.")
+    parser.add_argument("--manifest", default=MANIFEST)
+    parser.add_argument("--root", default=LEAGUES_DIR, help="directory of league folders")
+    parser.add_argument("--fetch", action="store_true", help="refresh every league first")
+    parser.add_argument("--incremental", action="store_true")
+    parser.add_argument("--pipeline", action="store_true")
+    parser.add_argument("--top-k", type=int, default=10, help="entries per leaderboard")
+    args = parser.parse_args()
+
+    instrument.start("leagues")
+
+    manifest = load_json(args.manifest)
+
+    if args.fetch:
+        from dotenv import load_dotenv
+
+        load_dotenv("website.env")
+        fetch(manifest, args.root, args.incremental, args.pipeline)
+
+    results = analyze(
+        manifest,
+        args.root,
+        load_identities().name_map(),
+        k=args.top_k,
+        all_time_k=args.top_k,
+    )
+    leaderboards = combined_leaderboards(results, args.top_k)
+
+    print(f"All-Leagues Top {args.top_k} Narrowest Losses:\n")
+    for i, loss in enumerate(leaderboards["narrowest_losses"], start=1):
+        players = loss["players"]
+        print(f"  {i}. {loss['league']} {loss['year']} Week {loss['week']}:")
+        print(f"     Players: {players[0]} vs {players[1]}")
+        print(f"     Score Difference: {loss['difference']:.2f}")
+
+    print("\nAll-Leagues Highest Scores:\n")
+    for i, info in enumerate(leaderboards["highest_scores"], start=1):
+        print(
+            f"  {i}. {info['player']} ({info['league']} {info['year']} "
+            f"Week {info['week']}): {info['score']}"
+        )
+
+    print("\nAll-Leagues Best Average Death Week:\n")
+    for i, info in enumerate(leaderboards["average_death_week"], start=1):
+        print(f"  {i}. {info['player']} ({info['league']}): {info['average_death_week']:.2f}")
+
+    print("\nAll-Leagues Average Score:\n")
+    for i, info in enumerate(leaderboards["average_score"], start=1):
+        print(f"  {i}. {info['player']} ({info['league']}): {info['average_score']:.2f}")
+
+    print("\nAll-Leagues Unlucky Streaks:\n")
+    for i, info in enumerate(leaderboards["unlucky_streaks"], start=1):
+        print(
+            f"  {i}. {info['player']} ({info['league']} {info['year']} "
+            f"Week {info['death_week']}): {info['streak']} weeks"
+        )
+
+    save_to_json({"leagues": results, "leaderboards": leaderboards}, REPORT_FILE)
@@ -0,0 +1,197 @@
+import argparse
+import bisect
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+import instrument
+from fetch import make_session
+from sleeper import association_path, associate_rosters_with_users, get_weekly_matchups
+from utils import json_path, load_json, save_to_json
+from week_index import week_entry, week_scores
+
+# Seconds between polls on game days
+POLL_INTERVAL = 30
+
+
+def alive_rosters(year, week, roster_association):
+    """
+    Roster IDs still in the league for the week.
+
+    Read from sleeper_user_info.json when it exists. In season every live team's
+    death week is just its last scored week, so the previous week decides instead:
+    a user is out if they had no live score then or had its lowest score.
+    Otherwise every roster is alive.
+    """
+    info_path = json_path(f"{year}/sleeper_user_info.json")
+    if not info_path.exists() or week <= 1:
+        return set(roster_association)
+
+    user_info = load_json(info_path)
+
+    # The saved weeks may lag behind, then the last one known stands in for last week
+    saved = max((len(info["scores"] or []) for info in user_info.values()), default=0)
+    previous = min(week - 1, saved)
+    if previous < 1:
+        return set(roster_association)
+
+    scores = week_scores(user_info, previous)
+    dead = {user for user in user_info if scores.get(user, 0) <= 0}
+    entry = week_entry(previous, scores)
+    if entry["live"] > 1:
+        dead.add(entry["lowest"][0])
+    return {
+        roster_id
+        for roster_id, info in roster_association.items()
+        if info["username"] not in dead
+    }
+
+
+class LiveWeek:
+    """
+    Running standings of one week, updated from successive matchup payloads.
+
+    Only rosters whose points changed since the last payload are touched, and the
+    lowest/second lowest are only reported again when they actually move.
+    """
+
+    def __init__(self, week, roster_association, alive=None):
+        self.week = week
+        self.roster_association = roster_association
+        self.alive = set(roster_association) if alive is None else set(alive)
+        self.points = {}  # roster_id -> points in the last payload
+        self.payload = None  # the last payload, saved as week_N.json at the end
+        self.standings = []  # sorted (points, username) of the alive rosters
+        self._lowest = None
+
+    def update(self, matchups):
+        """Fold in a new payload and return the delta events it caused."""
+        events = []
+        if matchups is not None:
+            self.payload = matchups
+
+        for matchup in matchups or []:
+            roster_id = matchup["roster_id"]
+            points = matchup["points"]
+            if roster_id not in self.roster_association:
+                continue
+
+            previous = self.points.get(roster_id)
+            if previous == points:
+                continue
+            self.points[roster_id] = points
+
+            username = self.roster_association[roster_id]["username"]
+            events.append(
+                {
+                    "event": "score",
+                    "user": username,
+                    "points": points,
+                    "previous": previous,
+                }
+            )
+
+            if roster_id in self.alive:
+                if previous is not None:
+                    stale = bisect.bisect_left(self.standings, (previous, username))
+                    del self.standings[stale]
+                bisect.insort(self.standings, (points, username))
+
+        if events:
+            instrument.count("live.changes", len(events))
+            lowest = self.standings[:2]
+            if lowest != self._lowest:
+                self._lowest = lowest
+                events.append(self._standings_event(lowest))
+
+        for event in events:
+            event["week"] = self.week
+        return events
+
+    @staticmethod
+    def _standings_event(lowest):
+        pairs = [[username, points] for points, username in lowest]
+        event = {
+            "event": "standings",
+            "lowest": pairs[0] if pairs else None,
+            "second_lowest": pairs[1] if len(pairs) > 1 else None,
+        }
+        if len(lowest) > 1:
+            event["margin"] = round(lowest[1][0] - lowest[0][0], 2)
+        return event
+
+
+def emit(event, out):
+    out.write(json.dumps(event, separators=(",", ":")) + "\n")
+    out.flush()
+
+
+def poll(
+    league_id, live_week, session, interval=POLL_INTERVAL, polls=None, out=sys.stdout
+):
+    """
+    Poll a week's matchups over one connection and write delta events as JSONL.
+
+    :param polls: Stop after this many polls, poll until interrupted if None
+    """
+    count = 0
+    while polls is None or count < polls:
+        if count:
+            time.sleep(interval)
+        count += 1
+
+        matchups = get_weekly_matchups(league_id, live_week.week, session)
+        instrument.count("live.polls")
+        for event in live_week.update(matchups):
+            emit(event, out)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Follow a guillotine week live.")
+    parser.add_argument("year")
+    parser.add_argument("week", type=int)
+    parser.add_argument(
+        "--interval", type=float, default=POLL_INTERVAL, help="seconds between polls"
+    )
+    parser.add_argument("--polls", type=int, help="stop after this many polls")
+    parser.add_argument("--out", help="append events to this JSONL file instead of stdout")
+    args = parser.parse_args()
+
+    instrument.start("live")
+
+    load_dotenv("website.env")
+    league_id = json.loads(os.getenv("YEAR_MAP"))[args.year]
+
+    # One connection reused for every poll
+    session = make_session(1)
+
+    saved_association = association_path(args.year)
+    if saved_association.exists():
+        # JSON turned the roster IDs into strings
+        association = {int(k): v for k, v in load_json(saved_association).items()}
+    else:
+        association = associate_rosters_with_users(league_id, session)
+
+    live_week = LiveWeek(
+        args.week, association, alive_rosters(args.year, args.week, association)
+    )
+
+    out = open(args.out, "a") if args.out else sys.stdout
+    try:
+        poll(league_id, live_week, session, args.interval, args.polls, out)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # The week file is written once when polling stops, not on every tick
+        if live_week.payload is not None:
+            Path(args.year).mkdir(parents=True, exist_ok=True)
+            save_to_json(
+                live_week.payload, f"{args.year}/week_{args.week}.json", compact=True
+            )
+        if args.out:
+            out.close()
+        session.close()
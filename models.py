@@ -0,0 +1,74 @@
+import sys
+
+import numpy as np
+
+
+class SeasonRecord:
+    """One user's season: interned user name, year, float score array and death week."""
+
+    __slots__ = ("user", "year", "scores", "death_week")
+
+    def __init__(self, user, year, scores, death_week):
+        self.user = sys.intern(user)
+        self.year = int(year)
+        # Memory-mapped rows from season_store are kept as views, lists become arrays
+        self.scores = np.asarray([] if scores is None else scores, dtype=np.float64)
+        self.death_week = death_week
+
+    @classmethod
+    def from_dict(cls, user, year, data):
+        """Build a record from a {"scores": [...], "death_week": ...} user info entry."""
+        return cls(user, year, data.get("scores"), data.get("death_week"))
+
+    def to_dict(self):
+        """The {"scores": [...], "death_week": ...} layout of the *_user_info.json files."""
+        return {"scores": self.scores.tolist(), "death_week": self.death_week}
+
+    def __repr__(self):
+        return f"SeasonRecord({self.user!r}, {self.year}, death_week={self.death_week})"
+
+
+class LeagueHistory:
+    """Every SeasonRecord of a league, indexed by user and by year."""
+
+    __slots__ = ("by_user", "by_year")
+
+    def __init__(self, records=()):
+        self.by_user = {}  # user -> {year: SeasonRecord}
+        self.by_year = {}  # year -> {user: SeasonRecord}
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        self.by_user.setdefault(record.user, {})[record.year] = record
+        self.by_year.setdefault(record.year, {})[record.user] = record
+
+    @classmethod
+    def from_final_player(cls, data):
+        """Build a history from the nested final_player[user][year] dict."""
+        history = cls()
+        for user, user_data in data.items():
+            for year, year_data in user_data.items():
+                if isinstance(year_data, dict):
+                    history.add(SeasonRecord.from_dict(user, year, year_data))
+        return history
+
+    def users(self):
+        return list(self.by_user)
+
+    def years(self):
+        return sorted(self.by_year)
+
+    def get(self, user, year):
+        return self.by_user.get(user, {}).get(year)
+
+    def user_info(self, year):
+        """One year back in the {user: {"scores", "death_week"}} JSON layout."""
+        return {user: record.to_dict() for user, record in self.by_year.get(year, {}).items()}
+
+    def final_player(self):
+        """The nested final_player[user][year] dict written to final_deaths.json."""
+        return {
+            user: {year: record.to_dict() for year, record in seasons.items()}
+            for user, seasons in self.by_user.items()
+        }
@@ -0,0 +1,183 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import instrument
+from fetch import MAX_WORKERS
+from sleeper import (
+    FINAL_WEEK,
+    association_path,
+    calculate_death_week,
+    finish_year,
+    get_weekly_matchups,
+    user_info_init,
+    week_points,
+)
+from utils import load_json, save_to_json
+
+# Week payloads allowed to wait between two stages before the earlier one pauses
+QUEUE_SIZE = 32
+
+# Week files being written at once before parsing waits for the disk
+MAX_WRITES = 8
+
+# Sent down a queue once the stage feeding it has finished
+_DONE = object()
+
+
+async def _fetch(jobs, year_map, session, max_workers, fetched):
+    """Fetch every (year, week), passing each payload on as soon as it arrives."""
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(max_workers)
+
+    # Requests get their own threads so file writes never hold up a fetch
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        async def fetch(year, week):
+            # The slot is held until the payload is queued, so a full queue stops new requests
+            async with limit:
+                matchups = await loop.run_in_executor(
+                    executor, get_weekly_matchups, year_map[year], week, session
+                )
+                await fetched.put((year, week, matchups))
+
+        await asyncio.gather(*(fetch(year, week) for year, week in jobs))
+
+    await fetched.put(_DONE)
+
+
+def _saved_week(year, week):
+    # The week file from an earlier run, None if there is none or it holds a failed fetch
+    path = Path(f"{year}/week_{week}.json")
+    return load_json(path) if path.exists() else None
+
+
+async def _parse(fetched, associations, parsed):
+    """
+    Write each week file in a thread and map the matchups to (username, score).
+
+    A failed fetch keeps the earlier week file and parses that instead. Without
+    one the week is passed on as None so its year is not ranked.
+    """
+    writes = set()
+
+    while (item := await fetched.get()) is not _DONE:
+        year, week, matchups = item
+
+        if matchups is None:
+            instrument.count("ingest.failed_weeks")
+            matchups = await asyncio.to_thread(_saved_week, year, week)
+            if matchups is None:
+                await parsed.put((year, week, None))
+                continue
+        else:
+            if len(writes) >= MAX_WRITES:
+                done, writes = await asyncio.wait(
+                    writes, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    task.result()  # Re-raise a failed write
+            writes.add(
+                asyncio.create_task(
+                    asyncio.to_thread(
+                        save_to_json, matchups, f"{year}/week_{week}.json", compact=True
+                    )
+                )
+            )
+
+        points = list(week_points(matchups, associations[year]))
+        instrument.count("pipeline.weeks_parsed")
+        await parsed.put((year, week, points))
+
+    if writes:
+        await asyncio.gather(*writes)
+    await parsed.put(_DONE)
+
+
+def _finish(year, roster_association, weeks):
+    # Weeks arrive in any order, scores are appended in week order like sleeper.scores
+    players = user_info_init(roster_association)
+    for week in sorted(weeks):
+        for username, score in weeks[week]:
+            players[username]["scores"].append(score)
+            instrument.count("ingest.scores")
+
+    for data in players.values():
+        data["death_week"] = calculate_death_week(data["scores"])
+
+    save_to_json(roster_association, association_path(year))
+    return finish_year(year, players)
+
+
+async def _aggregate(parsed, associations, weeks):
+    """
+    Collect each year's weeks and finish the year as soon as its last week is in.
+
+    A year with a week that could not be fetched or read from disk is left as it
+    was, ranking it without that week would shift every later score.
+    """
+    pending = {year: {} for year in weeks}
+    champions = {}
+
+    while (item := await parsed.get()) is not _DONE:
+        year, week, points = item
+        pending[year][week] = points
+
+        if len(pending[year]) == len(weeks[year]):
+            year_weeks = pending.pop(year)
+            failed = sorted(week for week, points in year_weeks.items() if points is None)
+            if failed:
+                instrument.count("pipeline.years_unfinished")
+                print(f"Skipped {year}: could not fetch weeks {failed}")
+                continue
+
+            champions[year] = await asyncio.to_thread(
+                _finish, year, associations[year], year_weeks
+            )
+
+    return champions
+
+
+async def run_pipeline(
+    year_map,
+    associations,
+    session=None,
+    max_workers=MAX_WORKERS,
+    weeks=None,
+    queue_size=QUEUE_SIZE,
+):
+    """
+    Fetch, parse and rank every year with the three stages running at once.
+
+    Stages are joined by bounded queues: when parsing or ranking falls behind,
+    fetching pauses instead of buffering every payload in memory. Requests and
+    file writes run in threads so the event loop only moves data between stages.
+
+    :param year_map: Map of year to Sleeper league ID
+    :param associations: Map of year to roster association, from associate_all_rosters
+    :param weeks: Optional map of year to the weeks to fetch, defaults to weeks 1-18
+    :return: Map of year to champion, for the years that finished
+    """
+    if weeks is None:
+        weeks = {year: range(1, FINAL_WEEK + 1) for year in year_map.keys()}
+    weeks = {year: list(year_weeks) for year, year_weeks in weeks.items() if year_weeks}
+    jobs = [(year, week) for year in weeks for week in weeks[year]]
+
+    fetched = asyncio.Queue(maxsize=queue_size)
+    parsed = asyncio.Queue(maxsize=queue_size)
+
+    with instrument.stage("pipeline.run"):
+        _, _, champions = await asyncio.gather(
+            _fetch(jobs, year_map, session, max_workers, fetched),
+            _parse(fetched, associations, parsed),
+            _aggregate(parsed, associations, weeks),
+        )
+
+    return champions
+
+
+def refresh(year_map, associations, session=None, max_workers=MAX_WORKERS, weeks=None):
+    """Run the pipeline to completion from synchronous code such as sleeper's __main__."""
+    return asyncio.run(
+        run_pipeline(year_map, associations, session, max_workers, weeks)
+    )
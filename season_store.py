@@ -0,0 +1,151 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from utils import SEASON_FILES, json_path, load_json, save_to_json
+
+# float64 so scores round-trip exactly and the stats match the JSON files
+SCORE_DTYPE = np.float64
+
+
+def store_paths(year, stem):
+    """Score array and string table paths for a season, e.g. 2021/espn_user_info.scores.npy."""
+    year_path = Path(str(year))
+    return year_path / f"{stem}.scores.npy", year_path / f"{stem}.users.json"
+
+
+def save_season(data, year, stem):
+    """
+    Write a season's user info as a fixed-width score array plus a string table.
+
+    :param data: User info dict of {user: {"scores": [...], "death_week": ...}}
+    :param year: Season directory to write into
+    :param stem: File name without extension, e.g. "sleeper_user_info"
+    """
+    scores_path, users_path = store_paths(year, stem)
+
+    users = list(data)
+    lengths = [len(data[user]["scores"] or []) for user in users]
+
+    # One row per user, padded with 0 (the same as a dead week) to the longest season
+    scores = np.zeros((len(users), max(lengths, default=0)), dtype=SCORE_DTYPE)
+    for i, user in enumerate(users):
+        scores[i, : lengths[i]] = data[user]["scores"] or []
+
+    np.save(scores_path, scores)
+    save_to_json(
+        {
+            "users": users,
+            "lengths": lengths,
+            "death_weeks": [data[user]["death_week"] for user in users],
+        },
+        users_path,
+        compact=True,
+    )
+
+
+def load_season(year, stem):
+    """
+    Memory-map a stored season.
+
+    Each user's scores are a read-only view into the mapped file, so nothing is
+    parsed or copied until a stat reads it.
+    """
+    scores_path, users_path = store_paths(year, stem)
+
+    scores = np.load(scores_path, mmap_mode="r")
+    table = load_json(users_path)
+
+    return {
+        user: {
+            "scores": scores[i, : table["lengths"][i]],
+            "death_week": table["death_weeks"][i],
+        }
+        for i, user in enumerate(table["users"])
+    }
+
+
+def is_current(year, stem):
+    """True if the binary store exists and is at least as new as its JSON source."""
+    scores_path, users_path = store_paths(year, stem)
+    if not (scores_path.exists() and users_path.exists()):
+        return False
+
+    source = json_path(Path(str(year)) / f"{stem}.json")
+    if not source.exists():
+        return True
+
+    return scores_path.stat().st_mtime >= source.stat().st_mtime
+
+
+def discover_years(root="."):
+    """Every year directory under root holding a season, as sorted ints."""
+    years = []
+    for path in Path(root).iterdir():
+        if not (path.is_dir() and path.name.isdigit()):
+            continue
+        if any(
+            json_path(path / file_name).exists()
+            or store_paths(path, Path(file_name).stem)[0].exists()
+            for file_name in SEASON_FILES
+        ):
+            years.append(int(path.name))
+
+    return sorted(years)
+
+
+def convert_year(year):
+    """Convert every per-year user info JSON file in the year directory."""
+    converted = []
+    for file_name in SEASON_FILES:
+        source = json_path(Path(str(year)) / file_name)
+        if source.exists():
+            stem = Path(file_name).stem
+            save_season(load_json(source), year, stem)
+            converted.append(stem)
+
+    return converted
+
+
+def archive_year(year, suffix=".gz"):
+    """
+    Compress a finished season's user info JSON files in place.
+
+    e.g. 2019/espn_user_info.json becomes 2019/espn_user_info.json.gz; load_json
+    and data_analysis read the archived file transparently.
+
+    :param suffix: ".gz", or ".zst" when zstandard is installed
+    """
+    archived = []
+    for file_name in SEASON_FILES:
+        source = Path(str(year)) / file_name
+        if source.exists():
+            archive = source.with_name(file_name + suffix)
+            save_to_json(load_json(source), archive, compact=True)
+            source.unlink()
+            archived.append(archive)
+
+    return archived
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert season user info files.")
+    parser.add_argument("years", nargs="*", help="years to convert, defaults to all")
+    parser.add_argument(
+        "--archive",
+        choices=[".gz", ".zst"],
+        help="compress the JSON files instead of building the binary store",
+    )
+    args = parser.parse_args()
+
+    # Convert the given years, or every year directory here
+    years = args.years or discover_years()
+
+    for year in years:
+        if args.archive:
+            for archive in archive_year(year, args.archive):
+                print(f"Archived {archive}")
+        else:
+            for stem in convert_year(year):
+                print(f"Converted {year}/{stem}.json")
@@ -0,0 +1,179 @@
+import argparse
+
+import numpy as np
+
+import instrument
+from data_analysis import LazyHistory
+
+# Seasons simulated per array batch, bounds memory to batch * users * weeks floats
+BATCH_SIZE = 5000
+
+
+def eliminate(scores, eliminations=1, start_week=1):
+    """
+    Run guillotine eliminations over a batch of seasons at once.
+
+    Each week from start_week on, the lowest scoring live teams are eliminated,
+    never the last one standing. Ties go to the first user, the same order as
+    the sorted user axis of the score matrix.
+
+    :param scores: (sims, users, weeks) weekly scores
+    :param eliminations: Teams eliminated each week
+    :param start_week: First 1-indexed week with an elimination
+    :return: (sims, users) death weeks, nan for teams still alive at the end
+    """
+    sims, users, weeks = scores.shape
+    alive = np.ones((sims, users), dtype=bool)
+    death_weeks = np.full((sims, users), np.nan)
+
+    for w in range(start_week - 1, weeks):
+        # Eliminate up to `eliminations` teams, leaving at least one alive
+        cut = np.minimum(eliminations, alive.sum(axis=1) - 1)
+        if not cut.any():
+            break
+
+        masked = np.where(alive, scores[:, :, w], np.inf)
+        ranks = np.argsort(np.argsort(masked, axis=1, kind="stable"), axis=1)
+        out = alive & (ranks < cut[:, np.newaxis])
+
+        death_weeks[out] = w + 1
+        alive &= ~out
+
+    return death_weeks
+
+
+def _champions(scores, death_weeks):
+    # The team still alive with the best final week wins when several outlast the season
+    final = np.where(np.isnan(death_weeks), scores[:, :, -1], -np.inf)
+    return final.argmax(axis=1)
+
+
+def projected_scores(scores):
+    """
+    (users, weeks) scores with the weeks after each user's real elimination filled in.
+
+    Dead (0) weeks become the user's average live score, so replays under other
+    rules have a score for users who survive longer than they really did.
+    """
+    live = scores > 0
+    counts = live.sum(axis=1)
+    means = np.where(live, scores, 0).sum(axis=1) / np.maximum(counts, 1)
+    return np.where(live, scores, means[:, np.newaxis])
+
+
+def replay(scores, users, eliminations=1, start_week=1):
+    """
+    Replay one season's real scores under different rules.
+
+    :param scores: (users, weeks) scores, e.g. a one-year ScoreMatrix's scores[0]
+    :param users: User names for the rows of scores
+    :return: ({user: death week, None if alive at the end}, champion)
+    """
+    season = projected_scores(np.asarray(scores, dtype=float))[np.newaxis]
+    death_weeks = eliminate(season, eliminations, start_week)
+    champion = users[_champions(season, death_weeks)[0]]
+
+    death_weeks = {
+        user: None if np.isnan(death_weeks[0, u]) else int(death_weeks[0, u])
+        for u, user in enumerate(users)
+    }
+    return death_weeks, champion
+
+
+@instrument.timed("simulator.monte_carlo")
+def monte_carlo(
+    scores,
+    users,
+    sims=10000,
+    eliminations=1,
+    start_week=1,
+    seed=None,
+    batch_size=BATCH_SIZE,
+):
+    """
+    Estimate each user's odds of winning and expected death week by resampling.
+
+    Every simulated week draws each user's score from their own live scores of
+    the season (with replacement), then eliminations run over the whole batch of
+    seasons as arrays. Users without a live score are left out.
+
+    :param scores: (users, weeks) scores, e.g. a one-year ScoreMatrix's scores[0]
+    :param users: User names for the rows of scores
+    :param sims: Seasons to simulate
+    :return: Dict of {user: {"win": probability, "expected_death_week": weeks,
+        "survival": [probability of being alive after each week]}}
+    """
+    scores = np.asarray(scores, dtype=float)
+    live = scores > 0
+    keep = np.flatnonzero(live.any(axis=1))
+    scores, live = scores[keep], live[keep]
+    users = [users[u] for u in keep]
+    n_users, weeks = scores.shape
+
+    # Each user's live scores packed to the left of a (users, max live weeks) pool
+    counts = live.sum(axis=1)
+    order = np.argsort(~live, axis=1, kind="stable")
+    pool = np.take_along_axis(scores, order, axis=1)
+
+    rng = np.random.default_rng(seed)
+    wins = np.zeros(n_users)
+    death_total = np.zeros(n_users)
+    alive_after = np.zeros((n_users, weeks))
+
+    for start in range(0, sims, batch_size):
+        n = min(batch_size, sims - start)
+
+        draws = rng.random((n, n_users, weeks)) * counts[np.newaxis, :, np.newaxis]
+        picks = draws.astype(int)
+        sampled = pool[np.arange(n_users)[np.newaxis, :, np.newaxis], picks]
+
+        death_weeks = eliminate(sampled, eliminations, start_week)
+        champions = _champions(sampled, death_weeks)
+        wins += np.bincount(champions, minlength=n_users)
+
+        # The champion's season counts as all of its weeks, like average_death_week
+        death_total += np.nan_to_num(death_weeks, nan=weeks).sum(axis=0)
+
+        died = np.where(np.isnan(death_weeks), weeks + 1, death_weeks)
+        alive_after += (died[:, :, np.newaxis] > np.arange(1, weeks + 1)).sum(axis=0)
+
+    return {
+        user: {
+            "win": float(wins[u] / sims),
+            "expected_death_week": float(death_total[u] / sims),
+            "survival": (alive_after[u] / sims).tolist(),
+        }
+        for u, user in enumerate(users)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay and simulate guillotine seasons.")
+    parser.add_argument("year", type=int)
+    parser.add_argument("--eliminations", type=int, default=1, help="teams cut each week")
+    parser.add_argument("--start-week", type=int, default=1, help="first week with a cut")
+    parser.add_argument("--sims", type=int, default=10000, help="Monte Carlo seasons")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    instrument.start("simulator")
+
+    history = LazyHistory(years=[args.year])
+    matrix = history.matrix(args.year)
+    scores = matrix.scores[0]
+
+    print(f"Replay of {args.year} with {args.eliminations} cut(s) from week {args.start_week}:\n")
+    replayed, champion = replay(scores, matrix.users, args.eliminations, args.start_week)
+    for user, week in sorted(replayed.items(), key=lambda x: (x[1] is None, x[1])):
+        print(f"  {user}: {'alive' if week is None else f'week {week}'}")
+    print(f"  Champion: {champion}")
+
+    print(f"\nMonte Carlo over {args.sims} seasons:\n")
+    odds = monte_carlo(
+        scores, matrix.users, args.sims, args.eliminations, args.start_week, args.seed
+    )
+    for user, result in sorted(odds.items(), key=lambda x: x[1]["win"], reverse=True):
+        print(
+            f"  {user}: win {result['win']:.1%}, "
+            f"expected death week {result['expected_death_week']:.2f}"
+        )
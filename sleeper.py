@@ -1,28 +1,58 @@
 import os
 import json
-import requests
+import argparse
 import glob
+from datetime import date, datetime
 from pathlib import Path
 
-from utils import save_to_json, load_json
+import instrument
+from fetch import MAX_WORKERS, fetch_concurrently, make_session
+from identity import IdentityIndex
+from utils import save_to_json, load_json, iter_json_array, json_path, map_years
+from week_index import index_path, update_week_index, write_week_index
 
-from dotenv import load_dotenv
+# SLEEPER_API can point the scripts at a local fake server
+SLEEPER_API = os.getenv("SLEEPER_API", "https://api.sleeper.app/v1")
 
+# Display names rarely change, so cached user lookups are reused for a week
+USER_MAX_AGE = 7 * 24 * 60 * 60
 
-def get_weekly_matchups(league_id, week):
+# Last week of the fantasy season
+FINAL_WEEK = 18
+
+
+def current_season():
+    """The NFL season in progress; January and February still belong to last year's season."""
+    today = date.today()
+    return today.year if today.month >= 3 else today.year - 1
+
+
+def season_end(season):
+    """Timestamp a season is over, March 1 of the next year like current_season."""
+    return datetime(season + 1, 3, 1).timestamp()
+
+
+@instrument.timed("fetch.matchups")
+def get_weekly_matchups(league_id, week, session=None):
     """
     Fetch weekly matchups from Sleeper API.
 
     :param league_id: The ID of the fantasy league
     :param week: The week number for which to fetch matchups
+    :param session: Optional pooled session from fetch.make_session
     :return: A list of matchup data for the specified week
     """
+    # requests is only imported by the functions that go over the network
+    import requests
+
+    session = session or requests
+
     # Endpoint to get the matchup data for a specific week
-    url = f"https://api.sleeper.app/v1/league/{league_id}/matchups/{week}"
+    url = f"{SLEEPER_API}/league/{league_id}/matchups/{week}"
 
     try:
         # Sending the GET request to Sleeper API
-        response = requests.get(url)
+        response = session.get(url)
         response.raise_for_status()  # Raise an exception for HTTP errors
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -30,28 +60,58 @@ def get_weekly_matchups(league_id, week):
         return None
 
 
-def get_league_rosters(league_id):
+@instrument.timed("fetch.nfl_state")
+def get_nfl_state(session=None):
+    """Fetch the current NFL season and week from Sleeper API."""
+    import requests
+
+    session = session or requests
+    url = f"{SLEEPER_API}/state/nfl"
+    response = session.get(url)
+    return response.json() if response.status_code == 200 else {}
+
+
+def last_complete_week(year, nfl_state):
+    """Last week of the given season whose games are all final."""
+    season = int(nfl_state.get("season") or current_season())
+
+    if season_year(year) < season:
+        return FINAL_WEEK
+    if season_year(year) > season:
+        return 0
+
+    # The current week is still being played
+    return min(max(int(nfl_state.get("week") or 0) - 1, 0), FINAL_WEEK)
+
+
+@instrument.timed("fetch.rosters")
+def get_league_rosters(league_id, session=None):
     """Fetch the rosters for the specified league."""
-    url = f"https://api.sleeper.app/v1/league/{league_id}/rosters"
-    response = requests.get(url)
+    import requests
+
+    session = session or requests
+    url = f"{SLEEPER_API}/league/{league_id}/rosters"
+    response = session.get(url)
     return response.json() if response.status_code == 200 else {}
 
 
-def get_user_info(user_id):
+@instrument.timed("fetch.user")
+def get_user_info(user_id, session=None):
     """Fetch user info for the given user ID."""
-    url = f"https://api.sleeper.app/v1/user/{user_id}"
-    response = requests.get(url)
-    return response.json() if response.status_code == 200 else {}
+    import requests
 
+    session = session or requests
+    url = f"{SLEEPER_API}/user/{user_id}"
+    response = session.get(url)
+    return response.json() if response.status_code == 200 else {}
 
-def associate_rosters_with_users(league_id):
-    """Associates roster IDs with user information."""
-    rosters = get_league_rosters(league_id)
 
+def roster_user_map(rosters, users):
+    """Map roster IDs to usernames given the rosters and the fetched user info by user ID."""
     roster_user_map = {}
     for roster_data in rosters:
         user_id = roster_data["owner_id"]  # Assuming 'owner_id' is the key for user ID
-        user_info = get_user_info(user_id)
+        user_info = users[user_id]
 
         # Skip the bot account
         if user_info["display_name"] == "GLExecutioner":
@@ -67,12 +127,94 @@ def associate_rosters_with_users(league_id):
     return roster_user_map
 
 
-def update_weekly_matchups(year_map):
-    for week in range(1, 19):
-        matchups = get_weekly_matchups(year_map[year], week)
+def associate_rosters_with_users(
+    league_id, session=None, max_workers=MAX_WORKERS, identities=None
+):
+    """Associates roster IDs with user information."""
+    return associate_all_rosters({None: league_id}, session, max_workers, identities)[None]
+
+
+def associate_all_rosters(
+    year_map, session=None, max_workers=MAX_WORKERS, identities=None
+):
+    """
+    Associates roster IDs with user information for every year, fetching concurrently.
+
+    :param identities: Optional identity.IdentityIndex; owners it already knows are
+        not fetched, and newly fetched owners are added to it
+    """
+    years = list(year_map.keys())
+
+    rosters = fetch_concurrently(
+        lambda year: get_league_rosters(year_map[year], session), years, max_workers
+    )
+    rosters = dict(zip(years, rosters))
+
+    # The same owners play year after year, so fetch each user only once
+    user_ids = list(
+        dict.fromkeys(
+            roster_data["owner_id"]
+            for year_rosters in rosters.values()
+            for roster_data in year_rosters
+        )
+    )
+    users = {}
+    if identities is not None:
+        for user_id in user_ids:
+            user_info = identities.sleeper_user(user_id)
+            if user_info is not None:
+                users[user_id] = user_info
+        instrument.count("identity.known_users", len(users))
+
+    unknown = [user_id for user_id in user_ids if user_id not in users]
+    fetched = fetch_concurrently(
+        lambda user_id: get_user_info(user_id, session), unknown, max_workers
+    )
+    for user_id, user_info in zip(unknown, fetched):
+        if identities is not None and user_info:
+            user_info = identities.add_sleeper_user(user_id, user_info)
+        users[user_id] = user_info
+
+    return {year: roster_user_map(rosters[year], users) for year in years}
+
+
+def association_path(year):
+    """
+    Roster association file of a year directory.
+
+    The year may be a namespaced directory such as leagues/main/2023, the file is
+    still named after the year itself.
+    """
+    year_path = Path(str(year))
+    return year_path / f"roster_user_association_{year_path.name}.json"
+
+
+def update_weekly_matchups(year_map, session=None, max_workers=MAX_WORKERS, weeks=None):
+    """
+    Fetch every week of every year at once and write each week_N.json.
+
+    :param weeks: Optional map of year to the weeks to fetch, defaults to weeks 1-18
+    """
+    if weeks is None:
+        weeks = {year: range(1, FINAL_WEEK + 1) for year in year_map.keys()}
+
+    jobs = [(year, week) for year in weeks.keys() for week in weeks[year]]
+
+    all_matchups = fetch_concurrently(
+        lambda job: get_weekly_matchups(year_map[job[0]], job[1], session),
+        jobs,
+        max_workers,
+    )
+
+    for (year, week), matchups in zip(jobs, all_matchups):
+        if matchups is None:
+            # A failed fetch keeps any earlier file instead of writing null over it
+            instrument.count("ingest.failed_weeks")
+            continue
+
         # Write JSON data to a file
         file_path = f"{year}/week_{week}.json"
-        save_to_json(matchups, file_path)
+        save_to_json(matchups, file_path, compact=True)
 
 
 def death_week(roster) -> list:
@@ -99,36 +241,169 @@ def calculate_death_week(scores):
     return None  # All scores were 0
 
 
-def scores(year, player_info, roster_association):
+def week_number(week_file):
+    """Week number from a week_N.json path, ignoring underscores in the directories."""
+    return int(Path(week_file).stem.split("_")[1])
+
+
+def week_files(year, weeks=None):
+    """Week JSON files for the year in week order, optionally only the given weeks."""
     # Step 1: Find all week JSON files
-    week_files = glob.glob(f"{year}/week_*.json")
+    week_files = glob.glob(f"{year}/week_[0-9]*.json")
 
     # Step 2: Sort the files based on week number
     # This sorts based on the numeric part of the filename
-    sorted_week_files = sorted(
-        week_files, key=lambda x: int(x.split("_")[1].split(".")[0])
-    )
+    sorted_week_files = sorted(week_files, key=week_number)
+
+    if weeks is not None:
+        weeks = set(weeks)
+        sorted_week_files = [
+            week_file
+            for week_file in sorted_week_files
+            if week_number(week_file) in weeks
+        ]
+
+    return sorted_week_files
+
 
-    # Step 3: Load JSON data from sorted files
-    for week_file in sorted_week_files:
-        week_data = load_json(week_file)
-        week_number = week_file.split("_")[1].split(".")[0]
+def week_points(matchups, roster_association):
+    """(username, score) for every matchup of a week whose roster is in the association."""
+    for matchup in matchups:
+        roster_id = matchup["roster_id"]
+        if roster_id in roster_association:
+            yield roster_association[roster_id]["username"], matchup["points"]
 
+
+@instrument.timed("ingest.append_scores")
+def append_scores(year, player_info, roster_association, weeks=None):
+    """Append each user's score for the given weeks and return the users who scored."""
+    scored = set()
+
+    # Step 3: Stream each matchup from the sorted files, one record in memory at a time
+    for week_file in week_files(year, weeks):
         # Update user data with scores for the current week
-        for matchup in week_data:
-            roster_id = matchup["roster_id"]
-            if roster_id in roster_association:
-                username = roster_association[roster_id]["username"]
-                score = matchup["points"]
+        for username, score in week_points(iter_json_array(week_file), roster_association):
+            # Append the score to the user's scores list
+            player_info[username]["scores"].append(score)
+            instrument.count("ingest.scores")
+            if score > 0:
+                scored.add(username)
 
-                # Append the score to the user's scores list
-                player_info[username]["scores"].append(score)
+    return scored
 
-    # Calc death week
-    for username, data in player_info.items():
-        data["death_week"] = calculate_death_week(data["scores"])
 
-    return player_info
+def fetched_weeks(year, weeks):
+    """The leading weeks whose week file holds matchups, up to the first missing or failed one."""
+    files = {week_number(week_file): week_file for week_file in week_files(year, weeks)}
+
+    fetched = []
+    for week in weeks:
+        if week not in files or next(iter_json_array(files[week]), None) is None:
+            break
+        fetched.append(week)
+    return fetched
+
+
+def user_records(year, player_info) -> list:
+    """One SeasonRecord per user of a year's appended scores, with its death week."""
+    # models loads numpy, which only ranking a season needs
+    from models import SeasonRecord
+
+    return [
+        SeasonRecord(
+            username, season_year(year), data["scores"], calculate_death_week(data["scores"])
+        )
+        for username, data in player_info.items()
+    ]
+
+
+def scores(year, player_info, roster_association):
+    append_scores(year, player_info, roster_association)
+
+    # Calc death week, then back to the *_user_info.json layout
+    return {
+        record.user: record.to_dict() for record in user_records(year, player_info)
+    }
+
+
+def load_watermark(year):
+    """Last week already folded into sleeper_user_info.json and the champion picked then."""
+    path = Path(f"{year}/watermark.json")
+    if not path.exists():
+        return {"last_week": 0, "champion": None}
+    return load_json(path)
+
+
+def update_scores_incremental(year, roster_association, last_week):
+    """
+    Fold only the weeks after the year's watermark into sleeper_user_info.json.
+
+    :param year: Season to update
+    :param roster_association: Roster ID to username map for the season
+    :param last_week: Last complete week of the season
+    :return: The updated user info, or None if the year was already up to date
+    """
+    watermark = load_watermark(year)
+    info_path = f"{year}/sleeper_user_info.json"
+
+    if watermark["last_week"] > 0 and json_path(info_path).exists():
+        players = load_json(info_path)
+    else:
+        players = user_info_init(roster_association)
+        watermark = {"last_week": 0, "champion": None}
+
+    # A week whose fetch failed stays after the watermark so the next run retries it
+    new_weeks = fetched_weeks(year, range(watermark["last_week"] + 1, last_week + 1))
+    if not new_weeks:
+        return None
+    last_week = new_weeks[-1]
+
+    # The season goes on, so the old champion gets their real death week back
+    old_champion = watermark["champion"]
+    if old_champion in players:
+        players[old_champion]["death_week"] = calculate_death_week(
+            players[old_champion]["scores"]
+        )
+
+    # Only users who scored in the new weeks can have a later death week
+    scored = append_scores(year, players, roster_association, new_weeks)
+    for username in scored:
+        players[username]["death_week"] = calculate_death_week(
+            players[username]["scores"]
+        )
+
+    # A champion is only named once one user is left or the final week is in
+    alive = {
+        username: data
+        for username, data in players.items()
+        if len(data["scores"]) == last_week and data["scores"][-1] > 0
+    }
+    champion_name = None
+    if len(alive) == 1:
+        champion_name = next(iter(alive))
+    elif len(alive) > 1 and last_week == FINAL_WEEK:
+        champion_name = champion(death_week(alive))
+
+    if champion_name in players:
+        players[champion_name]["death_week"] = None
+
+    save_to_json(players, info_path)
+
+    # Extend the weekly order statistics with just the new weeks
+    index = []
+    if watermark["last_week"] > 0 and index_path(year).exists():
+        index = load_json(index_path(year))
+    save_to_json(
+        update_week_index(index, players, new_weeks), index_path(year), compact=True
+    )
+
+    save_to_json(
+        {"last_week": last_week, "champion": champion_name},
+        f"{year}/watermark.json",
+        compact=True,
+    )
+
+    return players
 
 
 def user_info_init(roster_association):
@@ -172,49 +447,187 @@ def champion(users):
     return champion_name
 
 
-def update_info(roster, champion):
+def update_info(roster, champion, year):
     # Update the death_week of the champion to None (equivalent to null in JSON)
     roster[champion]["death_week"] = None
     save_to_json(roster, f"{year}/sleeper_user_info.json")
 
 
-if __name__ == "__main__":
+@instrument.timed("ingest.process_year")
+def process_year(year, roster_user_association):
+    """Build, rank and save one year's user info from its week files. Returns the champion."""
+    # Save the roster-user association to a JSON file
+    output_filename = association_path(year)
+    save_to_json(roster_user_association, output_filename)
+
+    # Fills in the user info json that has the user, their scores and their death week
+    players = user_info_init(roster_user_association)
+    players_full = scores(year, players, roster_user_association)
+
+    return finish_year(year, players_full)
+
+
+def finish_year(year, players_full):
+    """Save a year's scored user info, pick the champion and write the week index."""
+    output_filename = f"{year}/sleeper_user_info.json"
+    save_to_json(players_full, output_filename)
+
+    sorted_by_death = death_week(players_full)
+    champion_name = champion(sorted_by_death)
+    update_info(players_full, champion_name, year)
+
+    # Weekly lowest/second lowest/highest for instant per-week lookups
+    write_week_index(year, players_full)
+
+    return champion_name
+
+
+@instrument.timed("ingest.process_year_incremental")
+def process_year_incremental(year, roster_user_association, last_week):
+    """Save the roster association and fold the year's new weeks into its user info."""
+    save_to_json(roster_user_association, association_path(year))
+    update_scores_incremental(year, roster_user_association, last_week)
+
+
+def season_year(year):
+    """The season of a year key, which may be a namespaced directory like leagues/main/2023."""
+    return int(Path(str(year)).name)
+
+
+def cache_policy(session, year_map):
+    """Mark finished seasons' league data immutable and let user lookups age out."""
+    # Finished seasons never change, so their rosters and weeks cached after the
+    # season ended are final; anything cached while it was played is checked once more
+    for year, league_id in year_map.items():
+        season = season_year(year)
+        if season < current_season():
+            session.mark_immutable(
+                f"{SLEEPER_API}/league/{league_id}/", since=season_end(season)
+            )
+    session.set_max_age(f"{SLEEPER_API}/user/", USER_MAX_AGE)
+
+
+def refresh_years(
+    year_map,
+    session,
+    max_workers=MAX_WORKERS,
+    processes=None,
+    identities=None,
+    incremental=False,
+    pipeline=False,
+):
+    """
+    Fetch and rank every year of the year map in one batch.
+
+    :param year_map: Map of year directory to Sleeper league ID
+    :param incremental: Only fetch and fold in the weeks after each year's watermark
+    :param pipeline: Overlap fetching, parsing and ranking with the asyncio pipeline
+    :return: Map of year to champion for the years that were processed
+    """
+    if incremental:
+        # Only fetch and fold in the weeks after each year's watermark
+        nfl_state = get_nfl_state(session)
+        last_weeks = {year: last_complete_week(year, nfl_state) for year in year_map}
+        new_weeks = {
+            year: range(load_watermark(year)["last_week"] + 1, last_weeks[year] + 1)
+            for year in year_map.keys()
+        }
+        stale_years = {year: year_map[year] for year in year_map if new_weeks[year]}
+
+        associations = associate_all_rosters(
+            stale_years, session, max_workers, identities
+        )
+        update_weekly_matchups(
+            stale_years,
+            session,
+            max_workers,
+            weeks={year: new_weeks[year] for year in stale_years},
+        )
+
+        return map_years(
+            process_year_incremental,
+            {
+                year: (year, associations[year], last_weeks[year])
+                for year in stale_years.keys()
+            },
+            processes,
+        )
+
+    associations = associate_all_rosters(year_map, session, max_workers, identities)
+
+    if pipeline:
+        # Each week is parsed as soon as it arrives and each year ranked as soon as
+        # its last week is in, while the remaining weeks are still downloading
+        from pipeline import refresh
+
+        return refresh(year_map, associations, session, max_workers)
+
+    update_weekly_matchups(year_map, session, max_workers)
+
+    # Every year is independent, so parse and rank them in parallel
+    return map_years(
+        process_year,
+        {year: (year, associations[year]) for year in year_map.keys()},
+        processes,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh Sleeper guillotine data.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only fetch and add the weeks completed since the last run",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="overlap fetching, parsing and ranking with the asyncio pipeline",
+    )
+    args = parser.parse_args(argv)
+
+    instrument.start("sleeper")
+
+    from dotenv import load_dotenv
+
     load_dotenv("website.env")
 
     year_map = json.loads(os.getenv("YEAR_MAP"))  # league ID hash map
+    max_workers = int(os.getenv("SLEEPER_MAX_WORKERS", MAX_WORKERS))
+    processes = int(os.getenv("INGEST_PROCESSES", 0)) or None
 
     for year in year_map.keys():
         # Create the directory if it doesn't exist
         Path(year).mkdir(parents=True, exist_ok=True)
         print(f"Directory '{year}' created or already exists.")
 
-        roster_user_association = associate_rosters_with_users(year_map[year])
-
-        # Save the roster-user association to a JSON file
-        output_filename = f"{year}/roster_user_association_{year}.json"
-        save_to_json(roster_user_association, output_filename)
-
-        # Fills in the user info json that has the user, their scores and their death week
-        players = user_info_init(roster_user_association)
-        players_full = scores(year, players, roster_user_association)
-        output_filename = f"{year}/sleeper_user_info.json"
-        save_to_json(players_full, output_filename)
+    # One pooled session for the whole run, every year fetched at once
+    session = make_session(
+        max_workers, cache_dir=os.getenv("SLEEPER_CACHE_DIR", ".sleeper_cache")
+    )
+    cache_policy(session, year_map)
+
+    # Owners seen in earlier runs are resolved without any user request
+    identities = IdentityIndex()
+
+    refresh_years(
+        year_map,
+        session,
+        max_workers,
+        processes,
+        identities,
+        incremental=args.incremental,
+        pipeline=args.pipeline,
+    )
 
-        sorted_by_death = death_week(players_full)
-        champion_name = champion(sorted_by_death)
-        update_info(players_full, champion_name)
+    identities.save()
+    session.close()
 
     # week = 1  # Replace with the week number you want to query
 
     # Get the weekly matchups
     # matchups = get_weekly_matchups(league_id, week)
 
-    # if matchups:
-    #     # Print each matchup's details
-    #     for matchup in matchups:
-    #         print(f"Matchup ID: {matchup['matchup_id']}")
-    #         print(f"Roster ID: {matchup['roster_id']}")
-    #         print(f"Starters: {matchup['starters']}")
-    #         print(f"Players: {matchup['players']}")
-    #         print(f"Points: {matchup['points']}")
-    #         print("-" * 30)
+
+if __name__ == "__main__":
+    main()
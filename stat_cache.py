@@ -0,0 +1,91 @@
+import hashlib
+import os
+import pickle
+from pathlib import Path
+
+from season_store import SEASON_FILES, store_paths
+from utils import json_path
+
+CACHE_DIR = ".stat_cache"
+
+# Default number of cached (stat, year) results kept before the oldest are evicted
+MAX_ENTRIES = 1000
+
+
+def year_digest(year, *extra_files):
+    """
+    Content hash of everything a year's stats depend on.
+
+    :param year: Season directory holding the *_user_info.json files
+    :param extra_files: Other inputs mixed into the hash, e.g. the name mapping
+    """
+    digest = hashlib.sha256(str(year).encode())
+
+    paths = []
+    for file_name in SEASON_FILES:
+        # The plain file, or its .gz/.zst archive
+        paths.append(json_path(Path(str(year)) / file_name))
+        paths.extend(store_paths(year, Path(file_name).stem))
+    paths.extend(Path(path) for path in extra_files)
+
+    for path in paths:
+        digest.update(path.name.encode())
+        if path.exists():
+            with open(path, "rb") as input_file:
+                for block in iter(lambda: input_file.read(1024 * 1024), b""):
+                    digest.update(block)
+
+    return digest.hexdigest()
+
+
+class StatCache:
+    """On-disk store of per-year stat results keyed by the year's content hash."""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_entries=MAX_ENTRIES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+
+    def _prefix(self, stat, year, options):
+        option_key = "".join(f"-{key}{value}" for key, value in sorted(options.items()))
+        return f"{stat}{option_key}-{year}-"
+
+    def get(self, stat, year, digest, options=None):
+        """Return (True, result) on a hit or (False, None) on a miss."""
+        path = self.cache_dir / f"{self._prefix(stat, year, options or {})}{digest}.pkl"
+        if not path.exists():
+            return False, None
+
+        try:
+            with open(path, "rb") as cache_file:
+                result = pickle.load(cache_file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return False, None
+
+        # Touch the entry so eviction drops the least recently used first
+        os.utime(path)
+        return True, result
+
+    def put(self, stat, year, digest, result, options=None):
+        prefix = self._prefix(stat, year, options or {})
+
+        # Results for older inputs of the same stat and year will never be read again
+        for stale in self.cache_dir.glob(f"{prefix}*.pkl"):
+            stale.unlink(missing_ok=True)
+
+        path = self.cache_dir / f"{prefix}{digest}.pkl"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as cache_file:
+            pickle.dump(result, cache_file)
+        tmp_path.replace(path)
+
+        self._evict()
+
+    def _evict(self):
+        entries = list(self.cache_dir.glob("*.pkl"))
+        if len(entries) <= self.max_entries:
+            return
+
+        entries.sort(key=lambda path: path.stat().st_mtime)
+        for path in entries[: len(entries) - self.max_entries]:
+            path.unlink(missing_ok=True)
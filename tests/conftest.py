@@ -0,0 +1,72 @@
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# The scripts live at the repository root rather than in a package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class StubServer:
+    """
+    Local HTTP server answering GETs from a {path: handler} map.
+
+    A handler takes the request headers and returns (status, headers, body). Every
+    request is recorded as (path, headers) so tests can check what was sent.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests.append((self.path, dict(self.headers)))
+                handler = stub.routes.get(self.path)
+                if handler is None:
+                    status, headers, body = 404, {}, b""
+                else:
+                    status, headers, body = handler(self.headers)
+
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def json(self, path, data, headers=None):
+        """Serve data as JSON at path, replacing any earlier payload."""
+        body = json.dumps(data).encode()
+        self.routes[path] = lambda _: (
+            200,
+            {"Content-Type": "application/json", **(headers or {})},
+            body,
+        )
+
+    def paths(self):
+        return [path for path, _ in self.requests]
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    yield server
+    server.close()
@@ -0,0 +1,99 @@
+from http_cache import CachedSession
+
+
+def test_etag_revalidation_serves_cached_body(stub_server, tmp_path):
+    body = b'{"week": 1}'
+
+    def matchups(headers):
+        if headers.get("If-None-Match") == '"v1"':
+            return 304, {"ETag": '"v1"'}, b""
+        return 200, {"ETag": '"v1"', "Content-Type": "application/json"}, body
+
+    stub_server.routes["/matchups/1"] = matchups
+    session = CachedSession(tmp_path)
+
+    first = session.get(f"{stub_server.url}/matchups/1")
+    second = session.get(f"{stub_server.url}/matchups/1")
+
+    assert first.status_code == second.status_code == 200
+    assert second.content == body
+    assert second.json() == {"week": 1}
+    assert "If-None-Match" not in stub_server.requests[0][1]
+    assert stub_server.requests[1][1]["If-None-Match"] == '"v1"'
+    assert (session.hits, session.misses) == (1, 1)
+
+
+def test_immutable_prefix_makes_no_request(stub_server, tmp_path):
+    stub_server.json("/league/2021/matchups/1", [{"roster_id": 1}])
+    session = CachedSession(tmp_path)
+    session.mark_immutable(f"{stub_server.url}/league/2021/")
+
+    for _ in range(3):
+        response = session.get(f"{stub_server.url}/league/2021/matchups/1")
+        assert response.json() == [{"roster_id": 1}]
+
+    assert stub_server.paths() == ["/league/2021/matchups/1"]
+
+
+def test_entries_cached_before_the_cutoff_are_revalidated_once(stub_server, tmp_path):
+    def matchups(headers):
+        if headers.get("If-None-Match") == '"final"':
+            return 304, {"ETag": '"final"'}, b""
+        return 200, {"ETag": '"final"'}, b"[]"
+
+    stub_server.routes["/league/2023/matchups/18"] = matchups
+    url = f"{stub_server.url}/league/2023/matchups/18"
+    session = CachedSession(tmp_path)
+    session.get(url)
+
+    # Cached while the season was still being played, before it ended at 100
+    session._index[url]["stored"] = 50
+    session.mark_immutable(f"{stub_server.url}/league/2023/", since=100)
+
+    for _ in range(3):
+        assert session.get(url).content == b"[]"
+
+    assert len(stub_server.requests) == 2
+    assert stub_server.requests[1][1]["If-None-Match"] == '"final"'
+
+
+def test_index_survives_reopen(stub_server, tmp_path):
+    stub_server.json("/state/nfl", {"season": "2024"})
+    session = CachedSession(tmp_path)
+    session.mark_immutable(stub_server.url)
+    session.get(f"{stub_server.url}/state/nfl")
+    session.close()
+
+    reopened = CachedSession(tmp_path)
+    reopened.mark_immutable(stub_server.url)
+    assert reopened.get(f"{stub_server.url}/state/nfl").json() == {"season": "2024"}
+    assert len(stub_server.requests) == 1
+
+
+def test_least_recently_used_is_evicted(stub_server, tmp_path):
+    for name in "abc":
+        stub_server.routes[f"/{name}"] = lambda _, name=name: (200, {}, name.encode() * 10)
+    session = CachedSession(tmp_path, max_bytes=25)
+    session.mark_immutable(stub_server.url)
+
+    session.get(f"{stub_server.url}/a")
+    session.get(f"{stub_server.url}/b")
+    session.get(f"{stub_server.url}/a")  # b is now the least recently used
+    session.get(f"{stub_server.url}/c")
+
+    assert set(session._index) == {f"{stub_server.url}/a", f"{stub_server.url}/c"}
+    assert sum(path.stat().st_size for path in tmp_path.iterdir()) <= 25
+
+    session.get(f"{stub_server.url}/b")
+    assert stub_server.paths() == ["/a", "/b", "/c", "/b"]
+
+
+def test_unindexed_files_are_removed_on_open(stub_server, tmp_path):
+    stub_server.json("/user/1", {"display_name": "a"})
+    session = CachedSession(tmp_path)
+    session.get(f"{stub_server.url}/user/1")
+    # The run dies here, before close() saves the index
+
+    assert any(tmp_path.iterdir())
+    CachedSession(tmp_path)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+from utils import iter_json_array
+
+MATCHUPS = [
+    {"roster_id": 1, "points": 101.25, "players": ["4034", "6794"], "custom": None},
+    {"roster_id": 2, "points": 0, "name": 'tricky ], "quoted" [ {text}'},
+    {"roster_id": 3, "points": 88.5, "nested": {"a": [1, [2, 3]], "b": {}}},
+    [],
+    "plain string, with a comma",
+    12.5,
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 16, 64 * 1024])
+@pytest.mark.parametrize("indent", [None, 4])
+def test_items_across_chunk_boundaries(tmp_path, chunk_size, indent):
+    path = tmp_path / "week_1.json"
+    path.write_text(json.dumps(MATCHUPS, indent=indent))
+
+    assert list(iter_json_array(path, chunk_size=chunk_size)) == MATCHUPS
+
+
+@pytest.mark.parametrize("text", ["[]", " [ ] \n", "null", ""])
+def test_empty_or_failed_payload(tmp_path, text):
+    path = tmp_path / "week_1.json"
+    path.write_text(text)
+
+    assert list(iter_json_array(path, chunk_size=2)) == []
@@ -0,0 +1,26 @@
+import pytest
+
+import utils
+
+
+def test_default_is_an_installed_backend(monkeypatch):
+    monkeypatch.delenv("GUILLOTINE_JSON", raising=False)
+    assert utils._json_backend() in ("orjson", "ujson", "stdlib")
+
+
+def test_stdlib_override(monkeypatch):
+    monkeypatch.setenv("GUILLOTINE_JSON", "stdlib")
+    assert utils._json_backend() == "stdlib"
+
+
+def test_missing_backend_is_named(monkeypatch):
+    monkeypatch.setenv("GUILLOTINE_JSON", "ujson")
+    monkeypatch.setattr(utils, "ujson", None)
+    with pytest.raises(RuntimeError, match="ujson is not installed"):
+        utils._json_backend()
+
+
+def test_unknown_backend_is_rejected(monkeypatch):
+    monkeypatch.setenv("GUILLOTINE_JSON", "simdjson")
+    with pytest.raises(ValueError, match="simdjson"):
+        utils._json_backend()
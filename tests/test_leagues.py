@@ -0,0 +1,41 @@
+from pathlib import Path
+
+import data_analysis
+import instrument
+import leagues
+from utils import save_to_json
+
+MANIFEST = {
+    "main": {"platform": "sleeper", "years": {"2022": "L1", "2023": "L2"}},
+    "side": {"platform": "sleeper", "years": {"2022": "L3", "2023": "L4"}},
+}
+
+
+def season(offset):
+    # user1 goes out in week 1, the others in week 2
+    return {
+        f"user{u}": {
+            "scores": [100.0 + offset + u, 90.0 + u if u > 1 else 0, 0],
+            "death_week": 2 if u > 1 else 1,
+        }
+        for u in range(1, 5)
+    }
+
+
+def test_rerun_is_served_from_each_leagues_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for offset, year_dir in enumerate(leagues.year_dirs(MANIFEST)):
+        Path(year_dir).mkdir(parents=True)
+        save_to_json(season(offset), f"{year_dir}/sleeper_user_info.json")
+
+    first = leagues.analyze(MANIFEST)
+
+    # Every stat of every year of both leagues, run after run
+    for _ in range(2):
+        instrument.reset()
+        assert leagues.analyze(MANIFEST) == first
+        hits = instrument.snapshot()["counters"]["stat_cache.hits"]
+        assert hits == len(data_analysis.STATS) * 4
+
+    # The leagues saw different seasons, so their results differ
+    assert first["main"] != first["side"]
@@ -0,0 +1,97 @@
+import io
+import json
+
+import pytest
+
+import live
+import sleeper
+from fetch import make_session
+from utils import save_to_json
+
+ASSOCIATION = {roster_id: {"username": f"user{roster_id}"} for roster_id in range(1, 6)}
+
+# Five teams, one eliminated each week: user5, user4, then user3 (lowest in week 3)
+WEEKS = {
+    1: [90.0, 80.0, 70.0, 60.0, 50.0],
+    2: [91.0, 81.0, 71.0, 61.0, 0],
+    3: [92.0, 82.0, 72.0, 0, 0],
+}
+
+
+def payload(points):
+    return [
+        {"roster_id": roster_id, "points": score}
+        for roster_id, score in enumerate(points, start=1)
+    ]
+
+
+@pytest.fixture
+def season(tmp_path, monkeypatch):
+    """A 2024 season folded in incrementally through week 3."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "2024").mkdir()
+    for week, points in WEEKS.items():
+        save_to_json(payload(points), f"2024/week_{week}.json")
+    sleeper.update_scores_incremental("2024", ASSOCIATION, 3)
+
+
+def test_alive_rosters_in_season(season):
+    assert live.alive_rosters("2024", 4, ASSOCIATION) == {1, 2}
+    assert live.alive_rosters("2024", 3, ASSOCIATION) == {1, 2, 3}
+    assert live.alive_rosters("2024", 1, ASSOCIATION) == set(ASSOCIATION)
+
+
+def test_alive_rosters_when_saved_weeks_lag(season):
+    # Only week 3 is known, so week 5 still leaves out everyone who was out by week 4
+    assert live.alive_rosters("2024", 5, ASSOCIATION) == {1, 2}
+
+
+def test_alive_rosters_without_user_info(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert live.alive_rosters("2024", 4, ASSOCIATION) == set(ASSOCIATION)
+
+
+def test_poll_emits_deltas(season, stub_server, monkeypatch):
+    payloads = [
+        payload([10.0, 20.0, 0, 0, 0]),
+        payload([30.0, 20.0, 0, 0, 0]),
+        payload([30.0, 20.0, 0, 0, 0]),
+    ]
+    stub_server.routes["/league/L1/matchups/4"] = lambda _: (
+        200,
+        {"Content-Type": "application/json"},
+        json.dumps(payloads.pop(0)).encode(),
+    )
+    monkeypatch.setattr(sleeper, "SLEEPER_API", stub_server.url)
+
+    live_week = live.LiveWeek(4, ASSOCIATION, live.alive_rosters("2024", 4, ASSOCIATION))
+    out = io.StringIO()
+    session = make_session(1)
+    live.poll("L1", live_week, session, interval=0, polls=3, out=out)
+    session.close()
+
+    events = [json.loads(line) for line in out.getvalue().splitlines()]
+    standings = [event for event in events if event["event"] == "standings"]
+    scores = [event for event in events if event["event"] == "score"]
+
+    assert len(stub_server.requests) == 3
+    # Five first scores, then only user1's change; the third poll changed nothing
+    assert [event["user"] for event in scores] == [f"user{r}" for r in range(1, 6)] + ["user1"]
+    assert scores[-1]["previous"] == 10.0
+    assert standings == [
+        {
+            "event": "standings",
+            "lowest": ["user1", 10.0],
+            "second_lowest": ["user2", 20.0],
+            "margin": 10.0,
+            "week": 4,
+        },
+        {
+            "event": "standings",
+            "lowest": ["user2", 20.0],
+            "second_lowest": ["user1", 30.0],
+            "margin": 10.0,
+            "week": 4,
+        },
+    ]
+    assert live_week.payload == payload([30.0, 20.0, 0, 0, 0])
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+import pipeline
+import sleeper
+from fetch import make_session
+from utils import load_json, save_to_json
+
+ASSOCIATION = {roster_id: {"username": f"user{roster_id}"} for roster_id in range(1, 5)}
+
+# Four teams, one eliminated each week, user1 wins
+WEEKS = {
+    1: [90.0, 80.0, 70.0, 60.0],
+    2: [91.0, 81.0, 71.0, 0],
+    3: [92.0, 82.0, 0, 0],
+    4: [93.0, 0, 0, 0],
+}
+
+
+def payload(points):
+    return [
+        {"roster_id": roster_id, "points": score}
+        for roster_id, score in enumerate(points, start=1)
+    ]
+
+
+@pytest.fixture
+def league(tmp_path, monkeypatch, stub_server):
+    """The season served by the stub server, except week 2 which fails with a 404."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sleeper, "SLEEPER_API", stub_server.url)
+    (tmp_path / "2019").mkdir()
+    for week, points in WEEKS.items():
+        if week != 2:
+            stub_server.json(f"/league/L19/matchups/{week}", payload(points))
+
+    def refresh():
+        session = make_session(2)
+        try:
+            return pipeline.refresh(
+                {"2019": "L19"},
+                {"2019": ASSOCIATION},
+                session,
+                max_workers=2,
+                weeks={"2019": WEEKS},
+            )
+        finally:
+            session.close()
+
+    return refresh
+
+
+def expected_user_info(tmp_path):
+    # The same season ranked by the non-pipeline path from complete week files
+    year = tmp_path / "expected" / "2019"
+    year.mkdir(parents=True)
+    for week, points in WEEKS.items():
+        save_to_json(payload(points), year / f"week_{week}.json")
+    sleeper.process_year(str(year), ASSOCIATION)
+    return load_json(year / "sleeper_user_info.json")
+
+
+def test_failed_week_uses_the_saved_file(league, tmp_path):
+    save_to_json(payload(WEEKS[2]), "2019/week_2.json", compact=True)
+    saved = (tmp_path / "2019" / "week_2.json").read_text()
+
+    assert league() == {"2019": "user1"}
+
+    assert (tmp_path / "2019" / "week_2.json").read_text() == saved
+    assert load_json("2019/sleeper_user_info.json") == expected_user_info(tmp_path)
+
+
+@pytest.mark.parametrize("saved", [None, "null"])
+def test_failed_week_without_a_file_leaves_the_year(league, tmp_path, capsys, saved):
+    if saved is not None:
+        (tmp_path / "2019" / "week_2.json").write_text(saved)
+
+    assert league() == {}
+
+    assert "Skipped 2019" in capsys.readouterr().out
+    assert not (tmp_path / "2019" / "sleeper_user_info.json").exists()
+    # The weeks that did arrive are still saved for the next run
+    assert json.loads((tmp_path / "2019" / "week_3.json").read_text()) == payload(WEEKS[3])
@@ -0,0 +1,53 @@
+import data_analysis
+import espn
+import instrument
+import season_store
+from utils import load_json, save_to_json
+
+SEASON = {
+    "a": {"scores": [90.0, 91.5, 0], "death_week": None},
+    "b": {"scores": [80.0, 0, 0], "death_week": 1},
+}
+
+
+def test_binary_store_without_json_source(tmp_path):
+    year = tmp_path / "2019"
+    year.mkdir()
+    season_store.save_season(SEASON, year, "espn_user_info")
+
+    assert season_store.discover_years(tmp_path) == [2019]
+
+    data = data_analysis.load_year(str(year))
+    assert list(data) == ["a", "b"]
+    assert list(data["a"]["scores"]) == [90.0, 91.5, 0]
+    assert data["b"]["death_week"] == 1
+
+
+def test_archived_json(tmp_path):
+    year = tmp_path / "2019"
+    year.mkdir()
+    save_to_json(SEASON, year / "espn_user_info.json")
+    season_store.archive_year(year)
+
+    assert not (year / "espn_user_info.json").exists()
+    assert season_store.discover_years(tmp_path) == [2019]
+    assert data_analysis.load_year(str(year)) == SEASON
+
+
+def test_archived_season_is_read_but_not_reranked(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(instrument, "start", lambda name: None)
+    monkeypatch.setenv("ESPN_YEARS", "2019-2020")
+    monkeypatch.setenv("INGEST_PROCESSES", "1")
+    for year in ("2019", "2020"):
+        (tmp_path / year).mkdir()
+        save_to_json(SEASON, tmp_path / year / "espn_user_info.json")
+    season_store.archive_year("2019")
+
+    espn.main([])
+
+    assert sorted(path.name for path in (tmp_path / "2019").iterdir()) == [
+        "espn_user_info.json.gz"
+    ]
+    assert (tmp_path / "2020" / "weekly_index.json").exists()
+    assert load_json("2019/espn_user_info.json") == SEASON
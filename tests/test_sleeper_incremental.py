@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+import sleeper
+from utils import load_json
+
+ASSOCIATION = {1: {"username": "a"}, 2: {"username": "b"}, 3: {"username": "c"}}
+
+
+@pytest.fixture
+def season(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "2024").mkdir()
+
+    def write_week(week, points):
+        payload = (
+            None
+            if points is None
+            else [{"roster_id": r, "points": p} for r, p in points.items()]
+        )
+        (tmp_path / "2024" / f"week_{week}.json").write_text(json.dumps(payload))
+
+    return write_week
+
+
+def test_failed_week_holds_the_watermark(season):
+    season(1, {1: 90.0, 2: 80.0, 3: 70.0})
+    season(2, {1: 91.0, 2: 81.0, 3: 0})
+    season(3, None)  # failed fetch
+    season(4, {1: 93.0, 2: 0, 3: 0})
+
+    players = sleeper.update_scores_incremental("2024", ASSOCIATION, 4)
+
+    assert sleeper.load_watermark("2024")["last_week"] == 2
+    assert players["a"]["scores"] == [90.0, 91.0]
+
+    # Once week 3 arrives the next run folds in weeks 3 and 4 in order
+    season(3, {1: 92.0, 2: 82.0, 3: 0})
+    players = sleeper.update_scores_incremental("2024", ASSOCIATION, 4)
+
+    assert sleeper.load_watermark("2024")["last_week"] == 4
+    assert players["b"]["scores"] == [80.0, 81.0, 82.0, 0]
+    assert players["b"]["death_week"] == 3
+
+
+def test_no_champion_while_several_are_alive(season):
+    season(1, {1: 90.0, 2: 80.0, 3: 70.0})
+    season(2, {1: 91.0, 2: 81.0, 3: 0})
+
+    sleeper.update_scores_incremental("2024", ASSOCIATION, 2)
+
+    info = load_json("2024/sleeper_user_info.json")
+    assert sleeper.load_watermark("2024")["champion"] is None
+    assert info["a"]["death_week"] == 2
+    assert info["b"]["death_week"] == 2
+
+    season(3, {1: 92.0, 2: 0, 3: 0})
+    sleeper.update_scores_incremental("2024", ASSOCIATION, 3)
+
+    info = load_json("2024/sleeper_user_info.json")
+    assert sleeper.load_watermark("2024")["champion"] == "a"
+    assert info["a"]["death_week"] is None
+    assert info["b"]["death_week"] == 2
+
+
+def test_failed_fetch_is_not_written(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "2024").mkdir()
+    (tmp_path / "2024" / "week_1.json").write_text("[]")
+    monkeypatch.setattr(sleeper, "get_weekly_matchups", lambda *args: None)
+
+    sleeper.update_weekly_matchups({"2024": "league"}, weeks={"2024": [1, 2]})
+
+    assert (tmp_path / "2024" / "week_1.json").read_text() == "[]"
+    assert not (tmp_path / "2024" / "week_2.json").exists()
@@ -1,15 +1,277 @@
+import contextlib
+import gzip
+import io
 import json
+import os
+import threading
+from pathlib import Path
 
+import instrument
 
-def save_to_json(data, filename):
-    """Save data to a JSON file."""
-    with open(filename, "w") as json_file:
-        json.dump(data, json_file, indent=4)
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
+try:
+    import ujson
+except ImportError:
+    ujson = None
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _json_backend():
+    """Fastest installed JSON library, GUILLOTINE_JSON=stdlib|ujson|orjson overrides it."""
+    backend = os.getenv("GUILLOTINE_JSON")
+    if not backend:
+        return "orjson" if orjson else "ujson" if ujson else "stdlib"
+
+    modules = {"stdlib": json, "ujson": ujson, "orjson": orjson}
+    if backend not in modules:
+        raise ValueError(
+            f"GUILLOTINE_JSON must be one of {', '.join(modules)}, not {backend!r}"
+        )
+    if modules[backend] is None:
+        raise RuntimeError(f"GUILLOTINE_JSON={backend} but {backend} is not installed")
+    return backend
+
+
+# Checked once here rather than failing inside the first load
+JSON_BACKEND = _json_backend()
+
+# Archived seasons can be stored compressed, picked by file suffix
+COMPRESSED_SUFFIXES = (".gz", ".zst")
+
+# Per-year user info files that can be converted to the binary store
+SEASON_FILES = ["espn_user_info.json", "sleeper_user_info.json"]
+
+
+def _to_builtin(obj):
+    # Score arrays from season_store serialize as plain lists
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def parse_years(spec):
+    """
+    Parse a year range setting such as "2019-2023" or "2019,2021,2023".
+
+    :return: Sorted list of years as ints
+    """
+    years = set()
+    for part in str(spec).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-")
+            years.update(range(int(first), int(last) + 1))
+        else:
+            years.add(int(part))
+
+    return sorted(years)
+
+
+def _dumps(data, compact):
+    # orjson only indents by 2, so pretty files keep the stdlib indent=4 layout
+    if compact and JSON_BACKEND == "orjson":
+        return orjson.dumps(
+            data,
+            default=_to_builtin,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+    if compact and JSON_BACKEND == "ujson":
+        return ujson.dumps(
+            data, default=_to_builtin, escape_forward_slashes=False
+        ).encode()
+
+    if compact:
+        return json.dumps(data, separators=(",", ":"), default=_to_builtin).encode()
+    return json.dumps(data, indent=4, default=_to_builtin).encode()
+
+
+def _loads(raw):
+    if JSON_BACKEND == "orjson":
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # stdlib accepts NaN/Infinity, which older files may contain
+            return json.loads(raw)
+    if JSON_BACKEND == "ujson":
+        return ujson.loads(raw)
+    return json.loads(raw)
+
+
+def _compress(raw, path):
+    if path.suffix == ".gz":
+        # mtime=0 keeps the archive bytes stable between identical writes
+        return gzip.compress(raw, mtime=0)
+    if path.suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is not installed, cannot write {path}")
+        return zstandard.ZstdCompressor().compress(raw)
+    return raw
+
+
+def _open_json(path, mode):
+    if path.suffix == ".gz":
+        return gzip.open(path, mode)
+    if path.suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is not installed, cannot read {path}")
+        return zstandard.open(path, mode)
+    return open(path, mode)
+
+
+def json_path(path):
+    """path itself, or its archived .gz/.zst copy when only that exists."""
+    path = Path(path)
+    if not path.exists():
+        for suffix in COMPRESSED_SUFFIXES:
+            archived = path.with_name(path.name + suffix)
+            if archived.exists():
+                return archived
+    return path
+
+
+@instrument.timed("json.save")
+def save_to_json(data, filename, compact=False):
+    """
+    Save data to a JSON file.
+
+    The file is written to a temporary file and renamed into place, so readers
+    never see a partial file. A .gz or .zst file name compresses the output.
+
+    :param compact: No indentation, encoded with the fastest installed backend,
+        for files only the scripts read (week files, indexes, watermarks)
+    """
+    path = Path(filename)
+    raw = _compress(_dumps(data, compact), path)
+
+    # Unique per process and thread so concurrent writers never share a temp file
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, "wb") as json_file:
+            json_file.write(raw)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    instrument.count("json.files_written")
+    instrument.count("json.bytes_written", len(raw))
+
+
+@instrument.timed("json.load")
 def load_json(name):
-    # Open and load the JSON file into a Python dictionary
-    with open(name, "r") as json_file:
-        roster = json.load(json_file)
+    """Load a JSON file, or its archived .gz/.zst copy when only that exists."""
+    path = json_path(name)
+    with _open_json(path, "rb") as json_file:
+        raw = json_file.read()
+    instrument.count("json.files_read")
+    instrument.count("json.bytes_read", len(raw))
+
+    return _loads(raw)
+
+
+def iter_json_array(name, chunk_size=64 * 1024):
+    """
+    Yield the items of a top-level JSON array one at a time.
+
+    Only one item and one read chunk are held in memory, so large files like the
+    Sleeper week_N.json payloads never have to be parsed in full.
+    """
+    decoder = json.JSONDecoder()
+    instrument.count("json.files_streamed")
+
+    with _open_json(json_path(name), "rt") as json_file:
+        buffer = json_file.read(chunk_size)
+        eof = not buffer
+
+        def skip(pos, chars):
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+            return pos
+
+        pos = skip(0, " \t\r\n")
+        if buffer[pos : pos + 1] != "[":
+            # Not an array (e.g. null from a failed fetch), so nothing to stream
+            data = json.loads(buffer + json_file.read()) if buffer.strip() else None
+            yield from data if isinstance(data, list) else []
+            return
+        pos += 1
+
+        while True:
+            pos = skip(pos, " \t\r\n,")
+
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                # Only trust the item once the next ',' or ']' is in the buffer,
+                # a number at the chunk edge may have been cut short
+                next_pos = skip(end, " \t\r\n")
+                complete = eof or (next_pos < len(buffer) and buffer[next_pos] in ",]")
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+
+            if complete:
+                instrument.count("json.records_streamed")
+                yield item
+                pos = end
+                continue
+
+            # Drop what has been consumed and read the next chunk
+            chunk = json_file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+
+def _run_captured(fn, args):
+    # Hold the worker's prints so they come out in year order, not interleaved
+    output = io.StringIO()
+    instrument.reset()
+    with contextlib.redirect_stdout(output):
+        result = fn(*args)
+    return result, output.getvalue(), instrument.snapshot()
+
+
+def map_years(fn, year_args, processes=None):
+    """
+    Run fn(*args) for every year in a process pool.
+
+    :param fn: Module-level function doing one year's work
+    :param year_args: Dict of {year: args tuple}
+    :param processes: Pool size, defaults to the number of cores; 1 runs in this process
+    :return: Dict of {year: result} in the same order as year_args
+    """
+    if processes == 1:
+        return {year: fn(*args) for year, args in year_args.items()}
+
+    # Spawning workers is the slow path, keep the import off the cheap ones
+    from concurrent.futures import ProcessPoolExecutor
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {
+            year: executor.submit(_run_captured, fn, args)
+            for year, args in year_args.items()
+        }
+
+        # Collect in submission order so results and output are deterministic
+        for year, future in futures.items():
+            result, output, metrics = future.result()
+            print(output, end="")
+            instrument.merge(metrics)
+            results[year] = result
 
-    return roster
+    return results
@@ -0,0 +1,134 @@
+import argparse
+import heapq
+from pathlib import Path
+
+from utils import SEASON_FILES, load_json, save_to_json
+
+# Saved next to each year's user info, e.g. 2021/weekly_index.json
+INDEX_FILE = "weekly_index.json"
+
+
+def week_entry(week, week_scores):
+    """
+    Order statistics of one week among live (> 0) scores.
+
+    :param week: 1-indexed week number
+    :param week_scores: Dict of {user: score} for the week
+    :return: Dict with the live count and [user, score] for the lowest,
+        second lowest and highest, None where there are not enough live teams
+    """
+    live = [(score, user) for user, score in week_scores.items() if score > 0]
+
+    # Two-minimum and maximum scans, ties resolve by name like sorting (score, user)
+    lowest = heapq.nsmallest(2, live)
+    highest = max(live, default=None)
+
+    def pair(item):
+        return None if item is None else [item[1], item[0]]
+
+    return {
+        "week": week,
+        "live": len(live),
+        "lowest": pair(lowest[0] if lowest else None),
+        "second_lowest": pair(lowest[1] if len(lowest) > 1 else None),
+        "highest": pair(highest),
+    }
+
+
+def week_scores(user_info, week):
+    """{user: score} for a 1-indexed week of a {user: {"scores": [...]}} dict."""
+    return {
+        user: info["scores"][week - 1]
+        for user, info in user_info.items()
+        if info["scores"] is not None and week <= len(info["scores"])
+    }
+
+
+def build_week_index(user_info):
+    """Order statistics for every week of a season's user info."""
+    weeks = max((len(info["scores"] or []) for info in user_info.values()), default=0)
+    return [week_entry(week, week_scores(user_info, week)) for week in range(1, weeks + 1)]
+
+
+def update_week_index(index, user_info, weeks):
+    """Add or replace the entries for the given weeks, e.g. the weeks an incremental run added."""
+    for week in weeks:
+        entry = week_entry(week, week_scores(user_info, week))
+        if week <= len(index):
+            index[week - 1] = entry
+        else:
+            # Fill any gap so entry N always sits at position N - 1
+            while len(index) < week - 1:
+                missing = len(index) + 1
+                index.append(week_entry(missing, week_scores(user_info, missing)))
+            index.append(entry)
+    return index
+
+
+def index_path(year):
+    return Path(str(year)) / INDEX_FILE
+
+
+def save_week_index(year, index):
+    save_to_json(index, index_path(year), compact=True)
+
+
+def write_week_index(year, user_info):
+    """Build and save a year's index from its user info."""
+    index = build_week_index(user_info)
+    save_week_index(year, index)
+    return index
+
+
+def load_week_index(year):
+    """A year's saved index, or None if it is missing or older than the user info."""
+    path = index_path(year)
+    if not path.exists():
+        return None
+
+    for file_name in SEASON_FILES:
+        json_path = Path(str(year)) / file_name
+        if json_path.exists() and json_path.stat().st_mtime > path.stat().st_mtime:
+            return None
+
+    return load_json(path)
+
+
+def eliminated(index, week):
+    """Who had the lowest score in a week and by how much, or None."""
+    if not 1 <= week <= len(index):
+        return None
+
+    entry = index[week - 1]
+    if entry["live"] < 2:
+        return None
+
+    (user, score), (_, second_score) = entry["lowest"], entry["second_lowest"]
+    return {"player": user, "score": score, "margin": second_score - score}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Who went out each week of a season.")
+    parser.add_argument("year")
+    parser.add_argument("week", type=int, nargs="?", help="defaults to every week")
+    args = parser.parse_args(argv)
+
+    index = load_week_index(args.year)
+    if index is None:
+        parser.exit(1, f"No up to date {INDEX_FILE} for {args.year}\n")
+
+    weeks = [args.week] if args.week else range(1, len(index) + 1)
+    for week in weeks:
+        result = eliminated(index, week)
+        if result is None:
+            print(f"Nobody was eliminated in week {week} of {args.year}")
+        else:
+            print(
+                f"Week {week} of {args.year}: {result['player']} eliminated with "
+                f"{result['score']} by {result['margin']:.2f}"
+            )
+
+
+if __name__ == "__main__":
+    # e.g. python week_index.py 2021 7
+    main()